@@ -0,0 +1,206 @@
+import asyncio
+import heapq
+import itertools
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.db.database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+from app.exceptions import ServiceOverloadedException
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    """
+    Admission rules for a class of routes.
+    :param name: policy name (str)
+    :param priority: waiters with lower value get free slots first (int)
+    :param concurrency: max requests of this class in progress (int)
+    :param queue_size: max requests of this class waiting for a slot (int)
+    :param timeout: max seconds to wait for a slot (float)
+    """
+
+    name: str
+    priority: int
+    concurrency: int
+    queue_size: int
+    timeout: float
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    policy: RoutePolicy = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class PriorityLimiter:
+    """
+    Concurrency limiter which hands free slots to waiters by priority.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.running: Counter = Counter()
+        self.waiting: Counter = Counter()
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def in_use(self) -> int:
+        return sum(self.running.values())
+
+    def _can_run(self, policy: RoutePolicy) -> bool:
+        return (
+            self.in_use < self.capacity
+            and self.running[policy.name] < policy.concurrency
+        )
+
+    def _wake(self) -> None:
+        """
+        Grants free slots to the highest priority waiters allowed to run.
+        """
+        skipped = []
+        while self._waiters and self.in_use < self.capacity:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():
+                continue
+            if not self._can_run(waiter.policy):
+                skipped.append(waiter)
+                continue
+            self.running[waiter.policy.name] += 1
+            waiter.future.set_result(None)
+        for waiter in skipped:
+            heapq.heappush(self._waiters, waiter)
+
+    async def acquire(self, policy: RoutePolicy) -> bool:
+        """
+        Waits for a slot no longer than policy timeout.
+        :param policy: route policy (RoutePolicy)
+        :return: True if slot acquired, False if queue is full or time is out.
+        """
+        if self.waiting[policy.name] >= policy.queue_size:
+            return False
+        waiter = _Waiter(
+            policy.priority,
+            next(self._seq),
+            policy,
+            asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._waiters, waiter)
+        self._wake()
+        if waiter.future.done():
+            return True
+        self.waiting[policy.name] += 1
+        try:
+            await asyncio.wait_for(waiter.future, policy.timeout)
+        except asyncio.TimeoutError:
+            return waiter.future.done() and not waiter.future.cancelled()
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(policy)
+            raise
+        finally:
+            self.waiting[policy.name] -= 1
+        return True
+
+    def release(self, policy: RoutePolicy) -> None:
+        """
+        Frees slot taken by request of given policy.
+        :param policy: route policy (RoutePolicy)
+        """
+        self.running[policy.name] -= 1
+        self._wake()
+
+
+def default_policies(capacity: int) -> List[RoutePolicy]:
+    """
+    Returns policies for order writes, other writes and catalog reads.
+    Catalog reads never take the last quarter of the slots, so order
+    writes can always get a connection.
+    :param capacity: number of database connections (int)
+    :return: List[RoutePolicy]
+    """
+    return [
+        RoutePolicy("order_write", 0, capacity, capacity * 4, 5.0),
+        RoutePolicy("write", 1, capacity, capacity * 2, 2.0),
+        RoutePolicy("read", 2, max(1, capacity - capacity // 4), capacity * 2, 1.0),
+    ]
+
+
+class AdmissionControlMiddleware:
+    """
+    Limits API requests in progress to the database pool capacity
+    and rejects requests which can not get a slot in time with 503.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        capacity: int = DB_POOL_SIZE + DB_MAX_OVERFLOW,
+        policies: Optional[List[RoutePolicy]] = None,
+        prefix: str = "/api/v1",
+    ):
+        self.app = app
+        self.prefix = prefix
+        self.limiter = PriorityLimiter(capacity)
+        # Given policies replace default policies with the same name.
+        self.policies = {
+            policy.name: policy
+            for policy in [*default_policies(capacity), *(policies or [])]
+        }
+
+    def get_policy(self, method: str, path: str) -> Optional[RoutePolicy]:
+        """
+        Returns policy for request or None if request is not limited.
+        :param method: HTTP method (str)
+        :param path: request path (str)
+        :return: Optional[RoutePolicy]
+        """
+        if not path.startswith(self.prefix):
+            return None
+        if method in ("GET", "HEAD"):
+            return self.policies["read"]
+        if path.startswith(f"{self.prefix}/orders"):
+            return self.policies["order_write"]
+        return self.policies["write"]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        policy = self.get_policy(scope["method"], scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+        if not await self.limiter.acquire(policy):
+            await self.reject(policy, scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(policy)
+
+    @staticmethod
+    async def reject(
+        policy: RoutePolicy, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        exception = ServiceOverloadedException()
+        response = JSONResponse(
+            status_code=exception.status_code,
+            content=jsonable_encoder(
+                {
+                    "result": exception.result,
+                    "error_type": exception.error_type,
+                    "error_message": exception.error_message,
+                }
+            ),
+            headers={"Retry-After": str(math.ceil(policy.timeout))},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,164 @@
+import math
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Integer, column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import repository
+from app.db.db_models import WarehouseStock
+
+# warehouse id -> product id -> amount
+Stock = Dict[int, Dict[int, int]]
+
+
+def distance(
+    latitude: float, longitude: float, other_latitude: float, other_longitude: float
+) -> float:
+    """
+    Returns great-circle distance between two points in kilometers.
+    """
+    latitude, longitude, other_latitude, other_longitude = map(
+        math.radians, (latitude, longitude, other_latitude, other_longitude)
+    )
+    a = (
+        math.sin((other_latitude - latitude) / 2) ** 2
+        + math.cos(latitude)
+        * math.cos(other_latitude)
+        * math.sin((other_longitude - longitude) / 2) ** 2
+    )
+    return 12742 * math.asin(math.sqrt(a))
+
+
+def allocate(
+    demand: Dict[int, int],
+    stock: Stock,
+    distances: Optional[Dict[int, float]] = None,
+) -> Stock:
+    """
+    Splits demand between as few warehouses as possible.
+    Warehouse covering most of the remaining demand is taken first,
+    ties go to the nearest warehouse or to the one with most stock.
+    Demand not covered by warehouses is left out of the result.
+    :param demand: product amounts, product id -> amount (Dict[int, int])
+    :param stock: warehouse id -> product id -> amount (Stock)
+    :param distances: warehouse id -> distance to destination (Dict[int, float])
+    :return: warehouse id -> product id -> allocated amount (Stock)
+    """
+    remaining = {id: amount for id, amount in demand.items() if amount > 0}
+    candidates = {
+        warehouse_id: products
+        for warehouse_id, products in stock.items()
+        if any(products.get(id, 0) > 0 for id in remaining)
+    }
+    allocations: Stock = {}
+    while remaining and candidates:
+        best_id, best_score = None, None
+        for warehouse_id, products in candidates.items():
+            covered, lines = 0, 0
+            for id, amount in remaining.items():
+                available = products.get(id, 0)
+                if available >= amount:
+                    covered += amount
+                    lines += 1
+                else:
+                    covered += available
+            score: Tuple[float, ...] = (
+                covered,
+                lines,
+                -distances.get(warehouse_id, math.inf) if distances else 0,
+                sum(products.values()),
+            )
+            if best_score is None or score > best_score:
+                best_id, best_score = warehouse_id, score
+        if best_id is None or best_score is None or best_score[0] == 0:
+            break
+        products = candidates.pop(best_id)
+        taken = {}
+        for id, amount in list(remaining.items()):
+            take = min(products.get(id, 0), amount)
+            if take > 0:
+                taken[id] = take
+                if take == amount:
+                    del remaining[id]
+                else:
+                    remaining[id] = amount - take
+        allocations[best_id] = taken
+    return allocations
+
+
+async def allocate_order(
+    session: AsyncSession,
+    demand: Dict[int, int],
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+) -> Dict[int, Dict[int, int]]:
+    """
+    Allocates order products to warehouses and takes them from warehouse stock.
+    Product rows must be locked by caller, so stock of these products does
+    not change until commit. Only allocated stock rows are updated.
+    :param session: Asynchronous session (AsyncSession)
+    :param demand: product amounts, product id -> amount (Dict[int, int])
+    :param latitude: order destination latitude (Optional[float])
+    :param longitude: order destination longitude (Optional[float])
+    :return: product id -> warehouse id -> amount (Dict[int, Dict[int, int]])
+    """
+    rows = await repository.get_stock_by_product_ids(session=session, ids=list(demand))
+    stock: Stock = defaultdict(dict)
+    distances: Dict[int, float] = {}
+    for warehouse_id, product_id, amount, w_latitude, w_longitude in rows:
+        stock[warehouse_id][product_id] = amount
+        if None not in (latitude, longitude, w_latitude, w_longitude):
+            distances[warehouse_id] = distance(
+                latitude, longitude, w_latitude, w_longitude  # type: ignore
+            )
+    allocations = allocate(demand, stock, distances)
+
+    taken_rows = [
+        (warehouse_id, product_id, amount)
+        for warehouse_id, products in allocations.items()
+        for product_id, amount in products.items()
+    ]
+    if taken_rows:
+        taken = values(
+            column("warehouse_id", Integer),
+            column("product_id", Integer),
+            column("amount", Integer),
+            name="taken",
+        ).data(taken_rows)
+        await session.execute(
+            update(WarehouseStock)
+            .filter(
+                WarehouseStock.warehouse_id == taken.c.warehouse_id,
+                WarehouseStock.product_id == taken.c.product_id,
+            )
+            .values(amount=WarehouseStock.amount - taken.c.amount)
+            .execution_options(synchronize_session=False)
+        )
+
+    by_product: Dict[int, Dict[int, int]] = defaultdict(dict)
+    for warehouse_id, product_id, amount in taken_rows:
+        by_product[product_id][warehouse_id] = amount
+    return by_product
+
+
+def take_allocation(allocated: Dict[int, int], amount: int) -> Dict[int, int]:
+    """
+    Takes amount of product from its warehouse allocations.
+    Amount not found in allocations is taken from stock without warehouse.
+    :param allocated: warehouse id -> allocated amount, changed in place
+    :param amount: amount of order item (int)
+    :return: warehouse id -> amount (Dict[int, int])
+    """
+    taken = {}
+    for warehouse_id in list(allocated):
+        if amount == 0:
+            break
+        take = min(allocated[warehouse_id], amount)
+        taken[warehouse_id] = take
+        amount -= take
+        if take == allocated[warehouse_id]:
+            del allocated[warehouse_id]
+        else:
+            allocated[warehouse_id] -= take
+    return taken
@@ -0,0 +1,16 @@
+import os
+
+from fastapi import Response
+
+# Cache-Control value of successful catalog reads, header is not set if empty.
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "")
+
+
+def catalog_cache_control(response: Response) -> None:
+    """
+    Dependency adding Cache-Control header to catalog read responses.
+    Error responses are built from exceptions and do not get the header.
+    :param response: response of the endpoint (Response)
+    """
+    if CATALOG_CACHE_CONTROL:
+        response.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
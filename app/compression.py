@@ -0,0 +1,236 @@
+import os
+import zlib
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.tracing import tracer
+
+try:
+    import brotli  # type: ignore[import-not-found]
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard  # type: ignore[import-not-found]
+except ImportError:
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class GzipCompressor:
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int = COMPRESSION_ZSTD_LEVEL):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Encodings in server preference order, used when client weights are equal.
+COMPRESSORS: Dict[str, Callable[..., Compressor]] = {
+    name: compressor
+    for name, compressor, module in (
+        ("zstd", ZstdCompressor, zstandard),
+        ("br", BrotliCompressor, brotli),
+        ("gzip", GzipCompressor, zlib),
+    )
+    if module is not None
+}
+
+
+def negotiate(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """
+    Returns encoding from Accept-Encoding header value to compress with.
+    Encoding with highest weight wins, ties go to earlier available one.
+    :param accept_encoding: Accept-Encoding header value (str)
+    :param available: supported encodings in preference order (List[str])
+    :return: Optional[str]
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+    best: Optional[Tuple[float, int]] = None
+    chosen = None
+    for index, name in enumerate(available):
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > 0 and (best is None or (weight, -index) > best):
+            best, chosen = (weight, -index), name
+    return chosen
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with encoding accepted by client.
+    Bodies smaller than minimum size are sent as is. Streamed bodies are
+    buffered until minimum size is reached, then compressed chunk by chunk.
+    Responses vary by Accept-Encoding even when they are not compressed.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        compressors: Optional[Dict[str, Callable[..., Compressor]]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressors = COMPRESSORS if compressors is None else compressors
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(
+            Headers(scope=scope).get("accept-encoding", ""), list(self.compressors)
+        )
+        if encoding is None:
+            await self.app(scope, receive, _VaryResponder(send).send)
+            return
+        responder = _CompressionResponder(
+            send, encoding, self.compressors[encoding], self.minimum_size
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _VaryResponder:
+    def __init__(self, send: Send):
+        self._send = send
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=list(message.get("headers", [])))
+            headers.add_vary_header("Accept-Encoding")
+            message["headers"] = headers.raw
+        await self._send(message)
+
+
+class _CompressionResponder:
+    def __init__(
+        self,
+        send: Send,
+        encoding: str,
+        compressor: Callable[..., Compressor],
+        minimum_size: int,
+    ):
+        self._send = send
+        self.encoding = encoding
+        self.compressor_factory = compressor
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+        elif message["type"] == "http.response.start":
+            headers = Headers(raw=message.get("headers", []))
+            if "content-encoding" in headers or message["status"] in (204, 304):
+                self.passthrough = True
+                await self._send(message)
+            else:
+                self.start = message
+        elif message["type"] == "http.response.body":
+            await self.send_body(message)
+        else:
+            await self._send(message)
+
+    async def send_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is not None:
+            data = self.compressor.compress(body) if body else b""
+            if not more_body:
+                data += self.compressor.finish()
+            await self._send(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+            return
+
+        self.buffer.append(body)
+        self.buffered += len(body)
+        if self.buffered < self.minimum_size:
+            if more_body:
+                return
+            await self._send_start(compressed=False)
+            await self._send(
+                {"type": "http.response.body", "body": b"".join(self.buffer)}
+            )
+            return
+
+        data = b"".join(self.buffer)
+        self.buffer = []
+        compressor = self.compressor = self.compressor_factory()
+        if more_body:
+            data = compressor.compress(data)
+        else:
+            with tracer.span("response.compress", encoding=self.encoding):
+                data = compressor.compress(data) + compressor.finish()
+        await self._send_start(compressed=True, length=None if more_body else len(data))
+        await self._send(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+
+    async def _send_start(self, compressed: bool, length: Optional[int] = None):
+        message = self.start
+        assert message is not None, "response start is sent before body"
+        headers = MutableHeaders(raw=list(message.get("headers", [])))
+        headers.add_vary_header("Accept-Encoding")
+        if compressed:
+            headers["Content-Encoding"] = self.encoding
+            if length is None:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(length)
+        message["headers"] = headers.raw
+        await self._send(message)
@@ -4,12 +4,25 @@ from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 
+from app.tracing import instrument_engine, tracer
+
 DB_HOST = os.getenv("POSTGRES_HOST")
 DB_USER = os.getenv("POSTGRES_USER")
 DB_PASS = os.getenv("POSTGRES_PASSWORD")
 DB_NAME = os.getenv("POSTGRES_DB")
 DB_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
-engine = create_async_engine(DB_URL)
+DB_POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("POSTGRES_MAX_OVERFLOW", 10))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("POSTGRES_STATEMENT_CACHE_SIZE", 500))
+engine = create_async_engine(
+    DB_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    query_cache_size=DB_STATEMENT_CACHE_SIZE * 2,
+    # Size of per connection prepared statements cache of the asyncpg dialect.
+    connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+)
+instrument_engine(engine.sync_engine)
 Base = declarative_base()
 async_session = async_sessionmaker(bind=engine, expire_on_commit=False)
 session = async_session()
@@ -22,4 +35,8 @@ async def get_session() -> AsyncGenerator:
     :rtype: AsyncGenerator
     """
     async with async_session() as new_session:
+        if tracer.enabled:
+            # Checkout is forced only to time it, otherwise it is lazy.
+            with tracer.span("db.session.checkout"):
+                await new_session.connection()
         yield new_session
@@ -1,19 +1,21 @@
 from datetime import datetime
-from typing import Any
 
 from sqlalchemy import (
     DECIMAL,
+    BigInteger,
+    CheckConstraint,
     Column,
     DateTime,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    func,
 )
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy.orm import relationship, selectinload
+from sqlalchemy.orm import relationship
 
 from .database import Base
 
@@ -33,17 +35,6 @@ class Product(Base):
     amount = Column(Integer, default=0)
     orders = relationship('Order', secondary='order_item')
 
-    @classmethod
-    async def get_product_by_id(cls, session: AsyncSession, id: int) -> Any | None:
-        """
-        Returns product with given id or None.
-        :param session: Asynchronous session (AsyncSession)
-        :param id: product id (int)
-        :return: Any | None
-        """
-        res = await session.execute(select(cls).filter(cls.id == id))
-        return res.unique().scalar_one_or_none()
-
 
 class Order(Base):
     """
@@ -58,19 +49,6 @@ class Order(Base):
     order_products = relationship("OrderItem", backref="order")
     products = relationship('Product', secondary='order_item')
 
-    @classmethod
-    async def get_order_by_id(cls, session: AsyncSession, id: int) -> Any | None:
-        """
-        Returns order with given id or None.
-        :param session: Asynchronous session (AsyncSession)
-        :param id: order id (int)
-        :return: Any | None
-        """
-        res = await session.execute(
-            select(cls).options(selectinload(cls.order_products)).filter(cls.id == id)
-        )
-        return res.unique().scalar_one_or_none()
-
 
 class OrderItem(Base):
     """
@@ -84,3 +62,81 @@ class OrderItem(Base):
     product_id = Column(Integer, ForeignKey("product.id"))
     amount = Column(Integer, nullable=False)
     product = relationship("Product", lazy="joined")
+    allocations = relationship("OrderItemAllocation", lazy="selectin")
+
+
+class Warehouse(Base):
+    """
+    Warehouses table
+    """
+
+    __tablename__ = "warehouse"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    name = Column(String, nullable=False, unique=True)
+    latitude = Column(Float)
+    longitude = Column(Float)
+
+
+class WarehouseStock(Base):
+    """
+    Product amounts stored in warehouses table
+    """
+
+    __tablename__ = "warehouse_stock"
+    __table_args__ = (CheckConstraint("amount >= 0"),)
+
+    warehouse_id = Column(
+        Integer, ForeignKey("warehouse.id", ondelete="CASCADE"), primary_key=True
+    )
+    product_id = Column(
+        Integer, ForeignKey("product.id", ondelete="CASCADE"), primary_key=True
+    )
+    amount = Column(Integer, nullable=False, default=0)
+
+
+class OrderItemAllocation(Base):
+    """
+    Warehouses order items are taken from table
+    """
+
+    __tablename__ = "order_item_allocation"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_item_id = Column(Integer, ForeignKey("order_item.id"), nullable=False)
+    warehouse_id = Column(Integer, ForeignKey("warehouse.id"), nullable=False)
+    amount = Column(Integer, nullable=False)
+
+
+class StockMovement(Base):
+    """
+    Append-only ledger of product amount changes table.
+    Products are not foreign keys, history outlives deleted products.
+    """
+
+    __tablename__ = "stock_movement"
+    __table_args__ = (Index(None, "product_id", "created_at"),)
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, nullable=False)
+    warehouse_id = Column(Integer)
+    order_id = Column(Integer)
+    delta = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)
+    created_at = Column(DateTime, default=func.localtimestamp(), nullable=False)
+
+
+class StockSnapshot(Base):
+    """
+    Product amounts at given time table.
+    Snapshot includes movements up to last_movement_id.
+    """
+
+    __tablename__ = "stock_snapshot"
+    __table_args__ = (Index(None, "product_id", "taken_at"),)
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, nullable=False)
+    amount = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+    last_movement_id = Column(BigInteger, nullable=False)
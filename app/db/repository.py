@@ -0,0 +1,234 @@
+import functools
+from collections import defaultdict
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import Integer, any_, bindparam, func
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from .db_models import Order, OrderItem, Product, Warehouse, WarehouseStock
+
+PRODUCT_FIELDS = ("id", "name", "description", "price", "amount")
+ORDER_FIELDS = ("id", "create_date", "status", "order_products")
+
+# Hot path statements are built once with named bound parameters. SQLAlchemy
+# memoizes the cache key of a statement object, so executions skip statement
+# construction and cache key generation.
+PRODUCTS = select(Product)
+PRODUCT_BY_ID = select(Product).filter(Product.id == bindparam("id"))
+PRODUCTS_BY_IDS = select(Product).filter(
+    Product.id == any_(bindparam("ids", type_=ARRAY(Integer)))
+)
+PRODUCTS_BY_IDS_FOR_UPDATE = PRODUCTS_BY_IDS.order_by(Product.id).with_for_update()
+PRODUCT_IDS_FOR_UPDATE = (
+    select(Product.id)
+    .filter(Product.id == any_(bindparam("ids", type_=ARRAY(Integer))))
+    .order_by(Product.id)
+    .with_for_update()
+)
+
+ORDERS = select(Order).options(selectinload(Order.order_products))
+ORDER_BY_ID = ORDERS.filter(Order.id == bindparam("id"))
+ORDERS_BY_IDS = ORDERS.filter(Order.id == any_(bindparam("ids", type_=ARRAY(Integer))))
+ORDER_ITEMS_LEAN = select(
+    OrderItem.order_id,
+    OrderItem.id,
+    OrderItem.amount,
+    Product.id,
+    Product.name,
+    Product.price,
+).join(Product, Product.id == OrderItem.product_id)
+
+WAREHOUSE_BY_ID = select(Warehouse).filter(Warehouse.id == bindparam("id"))
+STOCK_BY_PRODUCT_IDS = (
+    select(
+        WarehouseStock.warehouse_id,
+        WarehouseStock.product_id,
+        WarehouseStock.amount,
+        Warehouse.latitude,
+        Warehouse.longitude,
+    )
+    .join(Warehouse, Warehouse.id == WarehouseStock.warehouse_id)
+    .filter(
+        WarehouseStock.product_id == any_(bindparam("ids", type_=ARRAY(Integer))),
+        WarehouseStock.amount > 0,
+    )
+)
+
+LOCATED_STOCK_BY_PRODUCT_IDS = (
+    select(WarehouseStock.product_id, func.sum(WarehouseStock.amount))
+    .filter(WarehouseStock.product_id == any_(bindparam("ids", type_=ARRAY(Integer))))
+    .group_by(WarehouseStock.product_id)
+)
+
+
+async def get_products(session: AsyncSession) -> Sequence[Any]:
+    """
+    Returns all products.
+    :param session: Asynchronous session (AsyncSession)
+    :return: Sequence[Any]
+    """
+    res = await session.execute(PRODUCTS)
+    return res.scalars().all()
+
+
+@functools.lru_cache
+def _product_fields_statement(fields: Tuple[str, ...]) -> Any:
+    return select(*(getattr(Product, field) for field in fields))
+
+
+@functools.lru_cache
+def _order_fields_statement(fields: Tuple[str, ...]) -> Any:
+    return select(Order.id, *(getattr(Order, field) for field in fields))
+
+
+async def get_products_fields(
+    session: AsyncSession, fields: Sequence[str]
+) -> List[Dict[str, Any]]:
+    """
+    Returns given columns of all products, without loading entities.
+    :param session: Asynchronous session (AsyncSession)
+    :param fields: names of columns from PRODUCT_FIELDS (Sequence[str])
+    :return: List[Dict[str, Any]]
+    """
+    res = await session.execute(_product_fields_statement(tuple(fields)))
+    return [dict(row) for row in res.mappings()]
+
+
+async def get_product_by_id(session: AsyncSession, id: int) -> Any | None:
+    """
+    Returns product with given id or None.
+    :param session: Asynchronous session (AsyncSession)
+    :param id: product id (int)
+    :return: Any | None
+    """
+    res = await session.execute(PRODUCT_BY_ID, {"id": id})
+    return res.unique().scalar_one_or_none()
+
+
+async def get_products_by_ids(
+    session: AsyncSession, ids: Sequence[int], for_update: bool = False
+) -> Sequence[Any]:
+    """
+    Returns products with given ids in one query.
+    Rows are locked in id order if for_update is True.
+    :param session: Asynchronous session (AsyncSession)
+    :param ids: products ids (Sequence[int])
+    :param for_update: lock selected rows (bool)
+    :return: Sequence[Any]
+    """
+    res = await session.execute(
+        PRODUCTS_BY_IDS_FOR_UPDATE if for_update else PRODUCTS_BY_IDS,
+        {"ids": list(ids)},
+    )
+    return res.unique().scalars().all()
+
+
+async def get_orders(session: AsyncSession) -> Sequence[Any]:
+    """
+    Returns all orders with their items.
+    :param session: Asynchronous session (AsyncSession)
+    :return: Sequence[Any]
+    """
+    res = await session.execute(ORDERS)
+    return res.scalars().all()
+
+
+async def get_orders_fields(
+    session: AsyncSession, fields: Sequence[str]
+) -> List[Dict[str, Any]]:
+    """
+    Returns given fields of all orders, without loading entities.
+    Items of orders are returned with product id, name and price only.
+    :param session: Asynchronous session (AsyncSession)
+    :param fields: names of fields from ORDER_FIELDS (Sequence[str])
+    :return: List[Dict[str, Any]]
+    """
+    columns = tuple(field for field in fields if field not in ("id", "order_products"))
+    res = await session.execute(_order_fields_statement(columns))
+    rows = res.all()
+    orders = [
+        {field: getattr(row, field) for field in fields if field != "order_products"}
+        for row in rows
+    ]
+    if "order_products" in fields:
+        items = defaultdict(list)
+        res = await session.execute(ORDER_ITEMS_LEAN)
+        for order_id, id, amount, product_id, name, price in res.tuples():
+            items[order_id].append(
+                {
+                    "id": id,
+                    "amount": amount,
+                    "product": {"id": product_id, "name": name, "price": price},
+                }
+            )
+        for order, row in zip(orders, rows):
+            order["order_products"] = items[row.id]
+    return orders
+
+
+async def get_order_by_id(session: AsyncSession, id: int) -> Any | None:
+    """
+    Returns order with given id or None.
+    :param session: Asynchronous session (AsyncSession)
+    :param id: order id (int)
+    :return: Any | None
+    """
+    res = await session.execute(ORDER_BY_ID, {"id": id})
+    return res.unique().scalar_one_or_none()
+
+
+async def get_orders_by_ids(session: AsyncSession, ids: Sequence[int]) -> Sequence[Any]:
+    """
+    Returns orders with given ids in one query.
+    :param session: Asynchronous session (AsyncSession)
+    :param ids: orders ids (Sequence[int])
+    :return: Sequence[Any]
+    """
+    res = await session.execute(ORDERS_BY_IDS, {"ids": list(ids)})
+    return res.unique().scalars().all()
+
+
+async def get_warehouse_by_id(session: AsyncSession, id: int) -> Any | None:
+    """
+    Returns warehouse with given id or None.
+    :param session: Asynchronous session (AsyncSession)
+    :param id: warehouse id (int)
+    :return: Any | None
+    """
+    res = await session.execute(WAREHOUSE_BY_ID, {"id": id})
+    return res.scalar_one_or_none()
+
+
+async def get_stock_by_product_ids(
+    session: AsyncSession, ids: Sequence[int]
+) -> Sequence[Row]:
+    """
+    Returns warehouse id, product id, amount, warehouse latitude and longitude
+    of every warehouse stock row of given products with non-zero amount.
+    :param session: Asynchronous session (AsyncSession)
+    :param ids: products ids (Sequence[int])
+    :return: Sequence[Row]
+    """
+    res = await session.execute(STOCK_BY_PRODUCT_IDS, {"ids": list(ids)})
+    return res.all()
+
+
+async def get_located_stock(
+    session: AsyncSession, ids: Sequence[int]
+) -> Dict[int, int]:
+    """
+    Locks given products and returns their total warehouse stock.
+    Warehouse stock of a product changes only while its row is locked,
+    so returned amounts stay valid until commit. Products without
+    warehouse stock are left out.
+    :param session: Asynchronous session (AsyncSession)
+    :param ids: products ids (Sequence[int])
+    :return: product id -> amount stored in warehouses (Dict[int, int])
+    """
+    await session.execute(PRODUCT_IDS_FOR_UPDATE, {"ids": list(ids)})
+    res = await session.execute(LOCATED_STOCK_BY_PRODUCT_IDS, {"ids": list(ids)})
+    return {product_id: int(amount) for product_id, amount in res.tuples()}
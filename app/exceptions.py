@@ -52,3 +52,37 @@ class NoOrderException(WarehouseException):
         self.status_code = status.HTTP_404_NOT_FOUND
         self.error_type = "Order not found."
         self.error_message = "There is no such order in the database."
+
+
+class ProductStockException(WarehouseException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        self.error_type = "Amount below warehouse stock."
+        self.error_message = (
+            "Product amount can not be less than amount stored in warehouses."
+        )
+
+
+class ServiceOverloadedException(WarehouseException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        self.error_type = "Service overloaded."
+        self.error_message = "Too many requests in progress, please retry later."
+
+
+class WarehouseExistsException(WarehouseException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        self.error_type = "Warehouse already exists."
+        self.error_message = "Warehouse with given name already exists in the database."
+
+
+class NoWarehouseException(WarehouseException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_404_NOT_FOUND
+        self.error_type = "Warehouse not found."
+        self.error_message = "There is no such warehouse in the database."
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    cast,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.db_models import Product, StockMovement, StockSnapshot
+
+LEDGER_SNAPSHOT_INTERVAL = float(os.getenv("LEDGER_SNAPSHOT_INTERVAL", 3600))
+
+logger = logging.getLogger(__name__)
+
+
+def record_movement(
+    session: AsyncSession,
+    product_id: int,
+    delta: int,
+    reason: str,
+    warehouse_id: Optional[int] = None,
+    order_id: Optional[int] = None,
+) -> None:
+    """
+    Adds movement to session, so it is committed or rolled back together
+    with the change it records.
+    :param session: Asynchronous session (AsyncSession)
+    :param product_id: product id (int)
+    :param delta: change of product amount (int)
+    :param reason: order, edit, restock, create or delete (str)
+    :param warehouse_id: warehouse id, None for stock without warehouse
+    :param order_id: order id for order movements (Optional[int])
+    """
+    if delta == 0:
+        return
+    session.add(
+        StockMovement(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            order_id=order_id,
+            delta=delta,
+            reason=reason,
+        )
+    )
+
+
+async def record_opening_stock(session: AsyncSession) -> None:
+    """
+    Records current amount of products without movements as opening movement.
+    :param session: Asynchronous session (AsyncSession)
+    """
+    await session.execute(
+        insert(StockMovement).from_select(
+            ["product_id", "delta", "reason", "created_at"],
+            select(
+                Product.id,
+                func.coalesce(Product.amount, 0),
+                literal("opening"),
+                func.localtimestamp(),
+            ).filter(
+                ~select(StockMovement.id)
+                .filter(StockMovement.product_id == Product.id)
+                .exists(),
+                func.coalesce(Product.amount, 0) != 0,
+            ),
+        )
+    )
+
+
+async def take_snapshots(session: AsyncSession) -> None:
+    """
+    Stores amount of every product moved since last snapshots.
+    Movements up to the last movement id are included. The table is locked
+    against writes only while that id is read, once the lock is granted all
+    movements with lower ids are committed. The session is committed to
+    release the lock, snapshots are inserted in a new transaction.
+    :param session: Asynchronous session (AsyncSession)
+    """
+    await session.execute(
+        text(f"LOCK TABLE {StockMovement.__tablename__} IN SHARE MODE")
+    )
+    res = await session.execute(
+        select(func.max(StockMovement.id), cast(func.clock_timestamp(), DateTime))
+    )
+    last_movement_id, taken_at = res.one()
+    await session.commit()
+    previous = await session.scalar(
+        select(StockSnapshot.last_movement_id)
+        .order_by(StockSnapshot.id.desc())
+        .limit(1)
+    )
+    if last_movement_id is None or (
+        previous is not None and last_movement_id <= previous
+    ):
+        return
+    moved = select(StockMovement.product_id, StockMovement.delta).filter(
+        StockMovement.id <= last_movement_id
+    )
+    if previous is not None:
+        moved = moved.filter(StockMovement.id > previous)
+    moved_rows = moved.subquery("moved")
+    last = (
+        select(StockSnapshot.product_id, StockSnapshot.amount)
+        .filter(StockSnapshot.product_id.in_(select(moved_rows.c.product_id)))
+        .distinct(StockSnapshot.product_id)
+        .order_by(StockSnapshot.product_id, StockSnapshot.taken_at.desc())
+        .subquery("last")
+    )
+    await session.execute(
+        insert(StockSnapshot).from_select(
+            ["product_id", "amount", "taken_at", "last_movement_id"],
+            select(
+                moved_rows.c.product_id,
+                func.coalesce(last.c.amount, 0) + func.sum(moved_rows.c.delta),
+                literal(taken_at, DateTime),
+                literal(last_movement_id, BigInteger),
+            )
+            .outerjoin(last, last.c.product_id == moved_rows.c.product_id)
+            .group_by(moved_rows.c.product_id, last.c.amount),
+        )
+    )
+
+
+async def get_stock_at(
+    session: AsyncSession, product_id: int, at: Optional[datetime] = None
+) -> int:
+    """
+    Returns amount of product at given time, current amount if not given.
+    Latest snapshot before that time plus movements after it are summed.
+    :param session: Asynchronous session (AsyncSession)
+    :param product_id: product id (int)
+    :param at: point in time (Optional[datetime])
+    :return: int
+    """
+    last = (
+        select(StockSnapshot.amount, StockSnapshot.last_movement_id)
+        .filter(StockSnapshot.product_id == product_id)
+        .order_by(StockSnapshot.taken_at.desc())
+        .limit(1)
+    )
+    moved = select(func.sum(StockMovement.delta)).filter(
+        StockMovement.product_id == product_id
+    )
+    if at is not None:
+        last = last.filter(StockSnapshot.taken_at <= at)
+        moved = moved.filter(StockMovement.created_at <= at)
+    snapshot = (await session.execute(last)).first()
+    amount = 0
+    if snapshot is not None:
+        amount = snapshot.amount
+        moved = moved.filter(StockMovement.id > snapshot.last_movement_id)
+    delta = await session.scalar(moved)
+    if delta is None:
+        return amount
+    return amount + delta
+
+
+async def has_stock_history(session: AsyncSession, product_id: int) -> bool:
+    """
+    Checks if product has any movement or snapshot, deleted products keep them.
+    :param session: Asynchronous session (AsyncSession)
+    :param product_id: product id (int)
+    :return: bool
+    """
+    return bool(
+        await session.scalar(
+            select(
+                or_(
+                    select(StockMovement.id)
+                    .filter(StockMovement.product_id == product_id)
+                    .exists(),
+                    select(StockSnapshot.id)
+                    .filter(StockSnapshot.product_id == product_id)
+                    .exists(),
+                )
+            )
+        )
+    )
+
+
+async def run_snapshots(
+    session_factory: Callable[[], AsyncSession],
+    interval: float = LEDGER_SNAPSHOT_INTERVAL,
+) -> None:
+    """
+    Takes snapshots every interval seconds until cancelled.
+    :param session_factory: Asynchronous session maker
+    :param interval: seconds between snapshots (float)
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as session:
+                await take_snapshots(session)
+                await session.commit()
+        except Exception:
+            logger.exception("Stock snapshot failed.")
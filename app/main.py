@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, status
@@ -6,9 +7,13 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from app.admission import AdmissionControlMiddleware
+from app.compression import CompressionMiddleware
 from app.db import db_models
-from app.db.database import engine
-from app.routes import orders, products
+from app.db.database import async_session, engine
+from app.ledger import record_opening_stock, run_snapshots
+from app.routes import orders, products, warehouses
+from app.tracing import TracingMiddleware, tracer
 
 
 @asynccontextmanager
@@ -16,8 +21,14 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         # await conn.run_sync(db_models.Base.metadata.drop_all)
         await conn.run_sync(db_models.Base.metadata.create_all)
+    async with async_session() as session:
+        await record_opening_stock(session)
+        await session.commit()
+    snapshots = asyncio.create_task(run_snapshots(async_session))
     yield
+    snapshots.cancel()
     await engine.dispose()
+    tracer.shutdown()
 
 
 app = FastAPI(
@@ -66,5 +77,9 @@ async def http_exception_handler(request, exception):
     )
 
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(TracingMiddleware)
 app.include_router(products.router)
 app.include_router(orders.router)
+app.include_router(warehouses.router)
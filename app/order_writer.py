@@ -0,0 +1,203 @@
+import asyncio
+import contextvars
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.allocation import allocate_order, take_allocation
+from app.db import repository
+from app.db.database import async_session
+from app.db.db_models import Order, OrderItem, OrderItemAllocation
+from app.exceptions import NoProductException, ProductAmountException
+from app.ledger import record_movement
+from app.tracing import tracer
+
+# Seconds to collect concurrent orders into one transaction, 0 turns it off.
+ORDER_GROUP_COMMIT_WINDOW = float(os.getenv("ORDER_GROUP_COMMIT_WINDOW", 0))
+ORDER_GROUP_COMMIT_MAX_SIZE = int(os.getenv("ORDER_GROUP_COMMIT_MAX_SIZE", 100))
+
+
+async def place_order(
+    session: AsyncSession,
+    order_products: Sequence[schemas.OrderRequestItem],
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+) -> Order:
+    """
+    Checks stock, allocates products to warehouses and adds new order
+    with its stock movements. Order is flushed, committing is left to caller.
+    :param session: Asynchronous session (AsyncSession)
+    :param order_products: Products id and amounts (Sequence[OrderRequestItem])
+    :param latitude: destination latitude (Optional[float])
+    :param longitude: destination longitude (Optional[float])
+    :return: Order
+    """
+    demand: Dict[int, int] = defaultdict(int)
+    for item in order_products:
+        demand[item.product_id] += item.product_amount
+    products = {
+        product.id: product
+        for product in await repository.get_products_by_ids(
+            session=session, ids=list(demand), for_update=True
+        )
+    }
+    for product_id, amount in demand.items():
+        if product_id not in products:
+            raise NoProductException
+        if products[product_id].amount < amount:
+            raise ProductAmountException
+    allocations = await allocate_order(
+        session=session, demand=demand, latitude=latitude, longitude=longitude
+    )
+
+    new_order = Order()
+    movements: List[Tuple[int, int, Optional[int]]] = []
+    for item in order_products:
+        product = products[item.product_id]
+        taken = take_allocation(allocations[item.product_id], item.product_amount)
+        new_order.order_products.append(
+            OrderItem(
+                product=product,
+                amount=item.product_amount,
+                allocations=[
+                    OrderItemAllocation(warehouse_id=warehouse_id, amount=amount)
+                    for warehouse_id, amount in taken.items()
+                ],
+            )
+        )
+        product.amount -= item.product_amount
+        movements.extend((product.id, -amount, w_id) for w_id, amount in taken.items())
+        remainder = item.product_amount - sum(taken.values())
+        movements.append((product.id, -remainder, None))
+
+    session.add(new_order)
+    await session.flush()
+    for product_id, delta, warehouse_id in movements:
+        record_movement(
+            session, product_id, delta, "order", warehouse_id, int(new_order.id)
+        )
+    return new_order
+
+
+@dataclass
+class _PendingOrder:
+    order_products: Sequence[schemas.OrderRequestItem]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    future: asyncio.Future
+
+
+class OrderWriter:
+    """
+    Creates orders. With a window set, orders arriving within the window
+    are written in one transaction with one commit. Every order runs in
+    its own savepoint, so a failed order is rolled back alone and its
+    error is raised to its caller only.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        window: float = ORDER_GROUP_COMMIT_WINDOW,
+        max_size: int = ORDER_GROUP_COMMIT_MAX_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_size = max_size
+        self.pending: List[_PendingOrder] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def create_order(
+        self,
+        order_products: Sequence[schemas.OrderRequestItem],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+    ) -> int:
+        """
+        Creates order and returns its id once it is committed.
+        :param order_products: Products id and amounts (Sequence[OrderRequestItem])
+        :param latitude: destination latitude (Optional[float])
+        :param longitude: destination longitude (Optional[float])
+        :return: int
+        """
+        if self.window <= 0:
+            async with self.session_factory() as session:
+                order = await place_order(session, order_products, latitude, longitude)
+                await session.commit()
+            return int(order.id)
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(_PendingOrder(order_products, latitude, longitude, future))
+        if len(self.pending) >= self.max_size:
+            batch, self.pending = self.pending, []
+            self._start(self._write(batch))
+        elif self._timer is None:
+            self._timer = self._start(self._write_later())
+        with tracer.span("order.group_commit.wait"):
+            return await future
+
+    def _start(self, coroutine) -> asyncio.Task:
+        # Batches run in a fresh context, outside of the trace of the request
+        # which happened to start them.
+        task = asyncio.create_task(coroutine, context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _write_later(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            await self._write(batch)
+
+    async def _write(self, batch: List[_PendingOrder]) -> None:
+        """
+        Writes orders of batch in one transaction and resolves their futures.
+        Products of all orders are locked up front in id order, so batches
+        lock rows in the same order as single orders do.
+        """
+        placed: List[Tuple[_PendingOrder, int]] = []
+        with tracer.span("order.group_commit", orders=len(batch)):
+            try:
+                async with self.session_factory() as session:
+                    ids = {
+                        item.product_id
+                        for pending in batch
+                        for item in pending.order_products
+                    }
+                    await repository.get_products_by_ids(
+                        session=session, ids=sorted(ids), for_update=True
+                    )
+                    for pending in batch:
+                        if pending.future.done():
+                            continue
+                        try:
+                            async with session.begin_nested():
+                                order = await place_order(
+                                    session,
+                                    pending.order_products,
+                                    pending.latitude,
+                                    pending.longitude,
+                                )
+                        except Exception as error:
+                            pending.future.set_exception(error)
+                        else:
+                            placed.append((pending, int(order.id)))
+                    await session.commit()
+            except Exception as error:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(error)
+                return
+        for pending, order_id in placed:
+            if not pending.future.done():
+                pending.future.set_result(order_id)
+
+
+order_writer = OrderWriter(async_session)
@@ -1,17 +1,20 @@
-from typing import Annotated, Dict, List, Literal, Sequence
+from typing import Annotated, Any, Dict, List, Literal, Optional, Sequence
 
-from fastapi import APIRouter, Body, Depends, Path, status
+from fastapi import APIRouter, Body, Depends, Path, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
 from app import schemas
+from app.db import repository
 from app.db.database import get_session
-from app.db.db_models import Order, OrderItem, Product
-from app.exceptions import NoOrderException, NoProductException, ProductAmountException
+from app.db.db_models import Order
+from app.exceptions import NoOrderException
+from app.order_writer import order_writer
+from app.tracing import TracedRoute
 
 router = APIRouter(
-    prefix="/api/v1/orders", tags=["orders"], dependencies=[Depends(get_session)]
+    prefix="/api/v1/orders",
+    tags=["orders"],
+    route_class=TracedRoute,
 )
 
 
@@ -26,51 +29,85 @@ router = APIRouter(
 )
 async def create_order(
     order_products: Annotated[List[schemas.OrderRequestItem], Body()],
-    session: AsyncSession = Depends(get_session),
+    latitude: Annotated[Optional[float], Query(ge=-90, le=90)] = None,
+    longitude: Annotated[Optional[float], Query(ge=-180, le=180)] = None,
 ) -> Dict[str, bool | int]:
     """
     Endpoint to create new order.
+    Products are taken from as few warehouses as possible,
+    nearest to the destination if it is given. Orders are written by
+    order writer, which can commit concurrent orders together.
     :param order_products: Products id and amounts (List[Dict])
-    :param session: Asynchronous session (AsyncSession)
+    :param latitude: destination latitude (Optional[float])
+    :param longitude: destination longitude (Optional[float])
     :return: Dict[str, bool | int]
     """
-    new_order = Order()
-    for item in order_products:
-        product = await Product.get_product_by_id(session=session, id=item.product_id)
-        if not product:
-            raise NoProductException
-        if product.amount < item.product_amount:
-            raise ProductAmountException
-        new_order.order_products.append(
-            OrderItem(product=product, amount=item.product_amount)
-        )
-        product.amount -= item.product_amount
-
-    session.add(new_order)
-    await session.commit()
-    return {"result": True, "order_id": int(new_order.id)}
+    order_id = await order_writer.create_order(
+        order_products=order_products, latitude=latitude, longitude=longitude
+    )
+    return {"result": True, "order_id": order_id}
 
 
 @router.get(
     "",
-    response_model=schemas.OrdersResponse,
+    response_model=schemas.OrdersResponse | schemas.PartialOrdersResponse,
+    response_model_exclude_unset=True,
     status_code=status.HTTP_200_OK,
+    responses={
+        422: {"model": schemas.FailResponse},
+    },
 )
 async def get_orders(
+    fields: Annotated[Optional[str], Query()] = None,
     session: AsyncSession = Depends(get_session),
-) -> Dict[str, bool | Sequence[Order]]:
+) -> Dict[str, bool | Sequence[Order] | List[Dict]]:
     """
     Endpoint to get list of all orders.
+    If fields are given, only these columns are selected and returned,
+    order products then have only id, name and price.
+    :param fields: comma separated order fields (Optional[str])
     :param session: Asynchronous session (AsyncSession)
-    :return: Dict[str, bool | Sequence[Order]]
+    :return: Dict[str, bool | Sequence[Order] | List[Dict]]
     """
-    res = await session.execute(
-        select(Order).options(selectinload(Order.order_products))
-    )
-    orders = res.scalars().all()
+    names = schemas.parse_fields(fields, repository.ORDER_FIELDS)
+    orders: Sequence[Any]
+    if names:
+        orders = await repository.get_orders_fields(session=session, fields=names)
+    else:
+        orders = await repository.get_orders(session=session)
     return {"result": True, "orders": orders}
 
 
+@router.get(
+    "/batch",
+    response_model=schemas.OrdersBatchResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def get_orders_batch(
+    ids: Annotated[List[int], Query(min_length=1, max_length=schemas.MAX_BATCH_SIZE)],
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool | Sequence[Order] | List[int]]:
+    """
+    Endpoint to get several orders by list of ids in one query.
+    :param ids: orders ids (List[int])
+    :param session: Asynchronous session (AsyncSession)
+    :return: Dict[str, bool | Sequence[Order] | List[int]]
+    """
+    ids = list(dict.fromkeys(ids))
+    found = {
+        order.id: order
+        for order in await repository.get_orders_by_ids(session=session, ids=ids)
+    }
+    return {
+        "result": True,
+        "orders": [found[id] for id in ids if id in found],
+        "missing_ids": [id for id in ids if id not in found],
+    }
+
+
 @router.get(
     "/{id}",
     response_model=schemas.OrderResponse,
@@ -89,7 +126,7 @@ async def get_order_by_id(
     :param session: Asynchronous session (AsyncSession)
     :return: Dict[str, bool | str | Order]
     """
-    order = await Order.get_order_by_id(session=session, id=id)
+    order = await repository.get_order_by_id(session=session, id=id)
     if not order:
         raise NoOrderException
     return {"result": True, "order": order}
@@ -116,7 +153,7 @@ async def change_order_status(
     :param session: Asynchronous session (AsyncSession)
     :return: Dict[str, bool | str]
     """
-    order = await Order.get_order_by_id(session=session, id=id)
+    order = await repository.get_order_by_id(session=session, id=id)
     if not order:
         raise NoOrderException
     order.status = status
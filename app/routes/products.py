@@ -1,22 +1,42 @@
-from typing import Annotated, Dict, Optional, Sequence
+from datetime import datetime
+from typing import Annotated, Any, Dict, List, Optional, Sequence
 
-from fastapi import APIRouter, Body, Depends, Path, status
-from sqlalchemy import update
+from fastapi import APIRouter, Body, Depends, Path, Query, status
+from sqlalchemy import (
+    DECIMAL,
+    Integer,
+    any_,
+    bindparam,
+    cast,
+    column,
+    func,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from app import schemas
+from app.caching import catalog_cache_control
+from app.db import repository
 from app.db.database import get_session
 from app.db.db_models import Product
 from app.exceptions import (
     NoProductException,
     ProductExistsException,
+    ProductStockException,
     ProductUpdateException,
 )
+from app.ledger import get_stock_at, has_stock_history, record_movement
+from app.tracing import TracedRoute
 
 router = APIRouter(
-    prefix="/api/v1/products", tags=["products"], dependencies=[Depends(get_session)]
+    prefix="/api/v1/products",
+    tags=["products"],
+    dependencies=[Depends(get_session)],
+    route_class=TracedRoute,
 )
 
 
@@ -55,33 +75,79 @@ async def add_product(
         new_product.description = description  # type: ignore
     session.add(new_product)
     try:
-        await session.commit()
+        await session.flush()
     except IntegrityError:
         raise ProductExistsException
+    record_movement(session, int(new_product.id), amount, "create")
+    await session.commit()
     return {"result": True, "product_id": int(new_product.id)}
 
 
 @router.get(
     "",
-    response_model=schemas.ProductsResponse,
+    response_model=schemas.ProductsResponse | schemas.PartialProductsResponse,
+    dependencies=[Depends(catalog_cache_control)],
+    response_model_exclude_unset=True,
     status_code=status.HTTP_200_OK,
+    responses={
+        422: {"model": schemas.FailResponse},
+    },
 )
 async def get_products(
+    fields: Annotated[Optional[str], Query()] = None,
     session: AsyncSession = Depends(get_session),
-) -> Dict[str, bool | Sequence[Product]]:
+) -> Dict[str, bool | Sequence[Product] | List[Dict]]:
     """
     Endpoint to get list of all products.
+    If fields are given, only these columns are selected and returned.
+    :param fields: comma separated product fields (Optional[str])
     :param session: Asynchronous session (AsyncSession)
-    :return: Dict[str, bool | Sequence[Product]]
+    :return: Dict[str, bool | Sequence[Product] | List[Dict]]
     """
-    res = await session.execute(select(Product))
-    products = res.scalars().all()
+    names = schemas.parse_fields(fields, repository.PRODUCT_FIELDS)
+    products: Sequence[Any]
+    if names:
+        products = await repository.get_products_fields(session=session, fields=names)
+    else:
+        products = await repository.get_products(session=session)
     return {"result": True, "products": products}
 
 
+@router.get(
+    "/batch",
+    response_model=schemas.ProductsBatchResponse,
+    dependencies=[Depends(catalog_cache_control)],
+    status_code=status.HTTP_200_OK,
+    responses={
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def get_products_batch(
+    ids: Annotated[List[int], Query(min_length=1, max_length=schemas.MAX_BATCH_SIZE)],
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool | Sequence[Product] | List[int]]:
+    """
+    Endpoint to get several products by list of ids in one query.
+    :param ids: products ids (List[int])
+    :param session: Asynchronous session (AsyncSession)
+    :return: Dict[str, bool | Sequence[Product] | List[int]]
+    """
+    ids = list(dict.fromkeys(ids))
+    found = {
+        product.id: product
+        for product in await repository.get_products_by_ids(session=session, ids=ids)
+    }
+    return {
+        "result": True,
+        "products": [found[id] for id in ids if id in found],
+        "missing_ids": [id for id in ids if id not in found],
+    }
+
+
 @router.get(
     "/{id}",
     response_model=schemas.ProductResponse,
+    dependencies=[Depends(catalog_cache_control)],
     status_code=status.HTTP_200_OK,
     responses={
         404: {"model": schemas.FailResponse},
@@ -97,12 +163,46 @@ async def get_product_by_id(
     :param session: Asynchronous session (AsyncSession)
     :return: Dict[str, bool | str | Product]
     """
-    product = await Product.get_product_by_id(session=session, id=id)
+    product = await repository.get_product_by_id(session=session, id=id)
     if not product:
         raise NoProductException
     return {"result": True, "product": product}
 
 
+@router.get(
+    "/{id}/stock",
+    response_model=schemas.StockAtResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        404: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def get_product_stock_at(
+    id: Annotated[int, Path(gt=0)],
+    at: Annotated[Optional[datetime], Query()] = None,
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool | int | datetime]:
+    """
+    Endpoint to get amount of product at given time from stock ledger.
+    Deleted products are found by their movements.
+    :param id: product id (int)
+    :param at: point in time, now if not given (Optional[datetime])
+    :param session: Asynchronous session (AsyncSession)
+    :return: Dict[str, bool | int | datetime]
+    """
+    if not await has_stock_history(session=session, product_id=id):
+        product = await repository.get_product_by_id(session=session, id=id)
+        if not product:
+            raise NoProductException
+    if at is not None and at.tzinfo is not None:
+        at = at.astimezone().replace(tzinfo=None)
+    amount = await get_stock_at(session=session, product_id=id, at=at)
+    if at is None:
+        at = datetime.now()
+    return {"result": True, "product_id": id, "amount": amount, "at": at}
+
+
 @router.put(
     "/{id}",
     response_model=schemas.ProductResponse,
@@ -119,26 +219,115 @@ async def edit_product(
 ) -> Dict[str, bool | str | Product]:
     """
     Endpoint to edit product with given id.
+    Amount is total stock, amount stored in warehouses included, so it can
+    not be set below warehouse stock. The rest is stock without warehouse.
     :param id: product id (int)
     :param product_update: Edited params (Dict)
     :param session: Asynchronous session (AsyncSession)
     :return: Dict[str, bool | str | Product]
     """
-    product = await Product.get_product_by_id(session=session, id=id)
-    if not product:
-        raise NoProductException
     update_data = {
         k: v for k, v in product_update.model_dump().items() if v is not None
     }
     if len(update_data) == 0:
         raise ProductUpdateException
-    await session.execute(
-        update(Product).filter(Product.id == id).values(**update_data)
+    if "amount" in update_data:
+        located = await repository.get_located_stock(session=session, ids=[id])
+        if update_data["amount"] < located.get(id, 0):
+            raise ProductStockException
+    old = (
+        select(Product.id, Product.amount)
+        .filter(Product.id == id)
+        .with_for_update()
+        .subquery("old")
+    )
+    try:
+        res = await session.execute(
+            update(Product)
+            .filter(Product.id == old.c.id)
+            .values(**update_data)
+            .returning(Product, old.c.amount)
+            .execution_options(synchronize_session=False)
+        )
+        row = res.one_or_none()
+        if not row:
+            raise NoProductException
+        product, old_amount = row
+    except IntegrityError:
+        raise ProductExistsException
+    record_movement(
+        session, product.id, (product.amount or 0) - (old_amount or 0), "edit"
     )
     await session.commit()
     return {"result": True, "product": product}
 
 
+@router.patch(
+    "",
+    response_model=schemas.BatchUpdateProductsResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def edit_products_batch(
+    products_update: Annotated[
+        List[schemas.BatchUpdateProduct],
+        Body(min_length=1, max_length=schemas.MAX_BATCH_UPDATE_SIZE),
+    ],
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool | List[int]]:
+    """
+    Endpoint to edit price and amount of several products in one statement.
+    Amounts can not be set below warehouse stock, as in edit_product.
+    :param products_update: Products ids with edited params (List[Dict])
+    :param session: Asynchronous session (AsyncSession)
+    :return: Dict[str, bool | List[int]]
+    """
+    rows = {item.id: (item.id, item.price, item.amount) for item in products_update}
+    if any(price is None and amount is None for _, price, amount in rows.values()):
+        raise ProductUpdateException
+    amounts = {id: amount for id, _, amount in rows.values() if amount is not None}
+    if amounts:
+        located = await repository.get_located_stock(session=session, ids=list(amounts))
+        if any(amount < located.get(id, 0) for id, amount in amounts.items()):
+            raise ProductStockException
+    new_values = values(
+        column("id", Integer),
+        column("price", DECIMAL(12, 2)),
+        column("amount", Integer),
+        name="product_update",
+    ).data(list(rows.values()))
+    old = (
+        select(Product.id, Product.amount)
+        .filter(Product.id == any_(bindparam("ids", list(rows), type_=ARRAY(Integer))))
+        .with_for_update()
+        .subquery("old")
+    )
+    res = await session.execute(
+        update(Product)
+        .filter(Product.id == new_values.c.id, Product.id == old.c.id)
+        .values(
+            price=func.coalesce(
+                cast(new_values.c.price, DECIMAL(12, 2)), Product.price
+            ),
+            amount=func.coalesce(cast(new_values.c.amount, Integer), Product.amount),
+        )
+        .returning(Product.id, Product.amount, old.c.amount)
+        .execution_options(synchronize_session=False)
+    )
+    updated_ids = set()
+    for product_id, amount, old_amount in res.all():
+        updated_ids.add(product_id)
+        record_movement(session, product_id, (amount or 0) - (old_amount or 0), "edit")
+    await session.commit()
+    return {
+        "result": True,
+        "updated_ids": [id for id in rows if id in updated_ids],
+        "missing_ids": [id for id in rows if id not in updated_ids],
+    }
+
+
 @router.delete(
     "/{id}",
     response_model=schemas.Response,
@@ -157,9 +346,10 @@ async def delete_product(
     :param session: Asynchronous session (AsyncSession)
     :return: Dict[str, bool | str]
     """
-    product = await Product.get_product_by_id(session=session, id=id)
+    product = await repository.get_product_by_id(session=session, id=id)
     if not product:
         raise NoProductException
+    record_movement(session, id, -(product.amount or 0), "delete")
     await session.delete(product)
     await session.commit()
     return {"result": True}
@@ -0,0 +1,137 @@
+from typing import Annotated, Dict, List, Optional, Sequence
+
+from fastapi import APIRouter, Body, Depends, Path, status
+from sqlalchemy import Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app import schemas
+from app.db import repository
+from app.db.database import get_session
+from app.db.db_models import Warehouse, WarehouseStock
+from app.exceptions import (
+    NoProductException,
+    NoWarehouseException,
+    WarehouseExistsException,
+)
+from app.ledger import record_movement
+from app.tracing import TracedRoute
+
+router = APIRouter(
+    prefix="/api/v1/warehouses",
+    tags=["warehouses"],
+    dependencies=[Depends(get_session)],
+    route_class=TracedRoute,
+)
+
+
+@router.post(
+    "",
+    response_model=schemas.CreateWarehouseResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def add_warehouse(
+    name: Annotated[str, Body()],
+    latitude: Annotated[Optional[float], Body(ge=-90, le=90)] = None,
+    longitude: Annotated[Optional[float], Body(ge=-180, le=180)] = None,
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool | int]:
+    """
+    Endpoint to add new warehouse.
+    :param name: warehouse name (str)
+    :param latitude: warehouse latitude (Optional[float])
+    :param longitude: warehouse longitude (Optional[float])
+    :param session: Asynchronous session (AsyncSession)
+    :return: Dict[str, bool | int]
+    """
+    new_warehouse = Warehouse(name=name, latitude=latitude, longitude=longitude)
+    session.add(new_warehouse)
+    try:
+        await session.commit()
+    except IntegrityError:
+        raise WarehouseExistsException
+    return {"result": True, "warehouse_id": int(new_warehouse.id)}
+
+
+@router.get(
+    "",
+    response_model=schemas.WarehousesResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_warehouses(
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool | Sequence[Warehouse]]:
+    """
+    Endpoint to get list of all warehouses.
+    :param session: Asynchronous session (AsyncSession)
+    :return: Dict[str, bool | Sequence[Warehouse]]
+    """
+    res = await session.execute(select(Warehouse))
+    warehouses = res.scalars().all()
+    return {"result": True, "warehouses": warehouses}
+
+
+@router.put(
+    "/{id}/stock",
+    response_model=schemas.Response,
+    status_code=status.HTTP_200_OK,
+    responses={
+        404: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def set_warehouse_stock(
+    id: Annotated[int, Path(gt=0)],
+    stock: Annotated[
+        List[schemas.StockItem],
+        Body(min_length=1, max_length=schemas.MAX_BATCH_UPDATE_SIZE),
+    ],
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool]:
+    """
+    Endpoint to set amounts of products stored in warehouse with given id.
+    Product amounts change by the same difference.
+    :param id: warehouse id (int)
+    :param stock: Products id and amounts (List[Dict])
+    :param session: Asynchronous session (AsyncSession)
+    :return: Dict[str, bool]
+    """
+    warehouse = await repository.get_warehouse_by_id(session=session, id=id)
+    if not warehouse:
+        raise NoWarehouseException
+    amounts = {item.product_id: item.amount for item in stock}
+    products = await repository.get_products_by_ids(
+        session=session, ids=list(amounts), for_update=True
+    )
+    if len(products) < len(amounts):
+        raise NoProductException
+    res = await session.execute(
+        select(WarehouseStock.product_id, WarehouseStock.amount).filter(
+            WarehouseStock.warehouse_id == id,
+            WarehouseStock.product_id
+            == any_(bindparam("ids", list(amounts), type_=ARRAY(Integer))),
+        )
+    )
+    old_amounts = dict(res.tuples().all())
+    upsert = insert(WarehouseStock)
+    await session.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[WarehouseStock.warehouse_id, WarehouseStock.product_id],
+            set_={"amount": upsert.excluded.amount},
+        ),
+        [
+            {"warehouse_id": id, "product_id": product_id, "amount": amount}
+            for product_id, amount in amounts.items()
+        ],
+    )
+    for product in products:
+        delta = amounts[product.id] - old_amounts.get(product.id, 0)
+        product.amount += delta
+        record_movement(session, product.id, delta, "restock", id)
+    await session.commit()
+    return {"result": True}
@@ -1,10 +1,13 @@
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
 from pydantic import BaseModel, ConfigDict, field_validator
 from starlette.exceptions import HTTPException
 
+MAX_BATCH_SIZE = 100
+MAX_BATCH_UPDATE_SIZE = 10000
+
 
 def validate_positive_value(val: int):
     if val <= 0:
@@ -12,6 +15,24 @@ def validate_positive_value(val: int):
     return val
 
 
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """
+    Returns list of fields from comma separated string, empty if not given.
+    """
+    if not fields:
+        return []
+    names = list(dict.fromkeys(field.strip() for field in fields.split(",")))
+    if not set(names) <= set(allowed):
+        raise HTTPException(422, f"Fields must be from: {', '.join(allowed)}.")
+    return names
+
+
+def validate_non_negative_value(val: int):
+    if val < 0:
+        raise HTTPException(422, "Value must not be less than 0.")
+    return val
+
+
 class Response(BaseModel):
     result: bool
 
@@ -33,11 +54,34 @@ class ProductsResponse(Response):
     products: List[Product]
 
 
+class PartialProduct(BaseModel):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    amount: Optional[int] = None
+
+
+class PartialProductsResponse(Response):
+    model_config = ConfigDict(from_attributes=True)
+    products: List[PartialProduct]
+
+
+class ProductsBatchResponse(ProductsResponse):
+    missing_ids: List[int]
+
+
 class ProductResponse(Response):
     model_config = ConfigDict(from_attributes=True)
     product: Product
 
 
+class StockAtResponse(Response):
+    product_id: int
+    amount: int
+    at: datetime
+
+
 class UpdateProduct(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
@@ -48,6 +92,21 @@ class UpdateProduct(BaseModel):
     _validate_amount = field_validator("amount")(validate_positive_value)
 
 
+class BatchUpdateProduct(BaseModel):
+    id: int
+    price: Optional[float] = None
+    amount: Optional[int] = None
+
+    _validate_id = field_validator("id")(validate_positive_value)
+    _validate_price = field_validator("price")(validate_positive_value)
+    _validate_amount = field_validator("amount")(validate_positive_value)
+
+
+class BatchUpdateProductsResponse(Response):
+    updated_ids: List[int]
+    missing_ids: List[int]
+
+
 class Statuses(Enum):
     processing = "processing"
     sent = "sent"
@@ -61,10 +120,16 @@ class OrderProduct(BaseModel):
     price: float
 
 
+class OrderItemAllocation(BaseModel):
+    warehouse_id: int
+    amount: int
+
+
 class OrderItem(BaseModel):
     id: int
     amount: int
     product: OrderProduct
+    allocations: List[OrderItemAllocation] = []
 
 
 class Order(BaseModel):
@@ -74,6 +139,32 @@ class Order(BaseModel):
     order_products: List[OrderItem]
 
 
+class PartialOrderProduct(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    price: float
+
+
+class PartialOrderItem(BaseModel):
+    id: int
+    amount: int
+    product: PartialOrderProduct
+    allocations: Optional[List[OrderItemAllocation]] = None
+
+
+class PartialOrder(BaseModel):
+    id: Optional[int] = None
+    create_date: Optional[datetime] = None
+    status: Optional[Statuses] = None
+    order_products: Optional[List[PartialOrderItem]] = None
+
+
+class PartialOrdersResponse(Response):
+    model_config = ConfigDict(from_attributes=True)
+    orders: List[PartialOrder]
+
+
 class CreateOrderResponse(Response):
     order_id: int
 
@@ -83,6 +174,10 @@ class OrdersResponse(Response):
     orders: List[Order]
 
 
+class OrdersBatchResponse(OrdersResponse):
+    missing_ids: List[int]
+
+
 class OrderResponse(Response):
     model_config = ConfigDict(from_attributes=True)
     order: Order
@@ -98,6 +193,30 @@ class OrderRequestItem(BaseModel):
     )
 
 
+class Warehouse(BaseModel):
+    id: int
+    name: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class CreateWarehouseResponse(Response):
+    warehouse_id: int
+
+
+class WarehousesResponse(Response):
+    model_config = ConfigDict(from_attributes=True)
+    warehouses: List[Warehouse]
+
+
+class StockItem(BaseModel):
+    product_id: int
+    amount: int
+
+    _validate_product_id = field_validator("product_id")(validate_positive_value)
+    _validate_amount = field_validator("amount")(validate_non_negative_value)
+
+
 class FailResponse(BaseModel):
     result: bool
     error_type: str
@@ -0,0 +1,432 @@
+import functools
+import json
+import os
+import re
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TRACING_EXPORT_PATH = os.getenv("TRACING_EXPORT_PATH")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", 1.0))
+SERVICE_NAME = "warehouse_api"
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP enum values of span kinds and status codes.
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_CODES = {"UNSET": 0, "OK": 1, "ERROR": 2}
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    Timed operation of a trace, fields follow OpenTelemetry span model.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        sampled: bool,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {}) if sampled else {}
+        self.kind = SPAN_KIND_INTERNAL
+        self.status = "UNSET"
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+
+    @property
+    def traceparent(self) -> str:
+        """
+        Returns W3C traceparent header value of the span.
+        """
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns span in OTLP JSON layout.
+        """
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": STATUS_CODES[self.status]},
+        }
+
+
+def export_request(spans: List[Span]) -> Dict[str, Any]:
+    """
+    Returns spans as OTLP ExportTraceServiceRequest in JSON layout.
+    :param spans: finished spans (List[Span])
+    :return: Dict[str, Any]
+    """
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [span.to_dict() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class InMemoryExporter:
+    """
+    Keeps finished spans in a list.
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def flush(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FileExporter:
+    """
+    Appends finished spans to a file, standing in for a collector. Spans are
+    buffered and every batch is written as one OTLP JSON line, which the
+    collector otlpjsonfile receiver reads. Writes run in a background thread,
+    so the event loop never waits for the file.
+    """
+
+    def __init__(self, path: str, batch_size: int = 512, interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self._buffer: List[Span] = []
+        self._last_flush = time.monotonic()
+        # One worker keeps batches in order.
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    def export(self, span: Span) -> None:
+        self._buffer.append(span)
+        if (
+            len(self._buffer) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        spans, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        if spans:
+            self._writer.submit(self._write, spans)
+
+    def _write(self, spans: List[Span]) -> None:
+        with open(self.path, "a") as file:
+            file.write(json.dumps(export_request(spans)) + "\n")
+
+    def shutdown(self) -> None:
+        """
+        Writes buffered spans and waits for pending writes.
+        """
+        self.flush()
+        self._writer.shutdown(wait=True)
+
+
+class Tracer:
+    """
+    Creates spans, samples traces and passes finished spans to exporter.
+    Tracing is off while exporter is None.
+    """
+
+    def __init__(self, exporter: Any = None, sample_ratio: float = 1.0):
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    def should_sample(self, trace_id: str) -> bool:
+        """
+        Samples trace by its id, so every service keeps the same traces.
+        :param trace_id: trace id (str)
+        :return: bool
+        """
+        return int(trace_id[16:], 16) < self.sample_ratio * 2**64
+
+    @staticmethod
+    def extract(headers: Mapping[str, str]) -> Optional[Span]:
+        """
+        Returns remote parent span from W3C traceparent header or None.
+        :param headers: request headers (Mapping[str, str])
+        :return: Optional[Span]
+        """
+        match = TRACEPARENT_RE.match(headers.get("traceparent", "").strip())
+        if not match or set(match[1]) == {"0"} or set(match[2]) == {"0"}:
+            return None
+        parent = Span("remote", match[1], None, bool(int(match[3], 16) & 1))
+        parent.span_id = match[2]
+        return parent
+
+    def start_span(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Span:
+        """
+        Starts span, child of given parent or of current span.
+        :param name: span name (str)
+        :param parent: parent span (Optional[Span])
+        :param attributes: span attributes (Optional[Dict[str, Any]])
+        :return: Span
+        """
+        parent = parent or _current_span.get()
+        if parent is None:
+            trace_id = secrets.token_hex(16)
+            return Span(name, trace_id, None, self.should_sample(trace_id), attributes)
+        return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.end_time = time.time_ns()
+        if error is not None:
+            span.status = "ERROR"
+            span.set_attribute("exception.type", type(error).__name__)
+        if span.sampled and self.exporter is not None:
+            self.exporter.export(span)
+
+    @staticmethod
+    def activate(span: Span) -> Token:
+        return _current_span.set(span)
+
+    @staticmethod
+    def deactivate(token: Token) -> None:
+        _current_span.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Runs block inside a new current span.
+        :param name: span name (str)
+        :param attributes: span attributes
+        :return: Iterator[Optional[Span]]
+        """
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, attributes=attributes)
+        token = self.activate(span)
+        try:
+            yield span
+        except BaseException as error:
+            self.end_span(span, error)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            self.deactivate(token)
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+tracer = Tracer(
+    FileExporter(TRACING_EXPORT_PATH) if TRACING_EXPORT_PATH else None,
+    TRACING_SAMPLE_RATIO,
+)
+
+
+class TracingMiddleware:
+    """
+    Starts server span for every HTTP request. Trace context is taken
+    from traceparent request header and returned in response header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+        span = tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            parent=tracer.extract(headers),
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        span.kind = SPAN_KIND_SERVER
+        token = tracer.activate(span)
+
+        async def send_with_traceparent(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "ERROR"
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"traceparent", span.traceparent.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_traceparent)
+        except BaseException as error:
+            tracer.end_span(span, error)
+            raise
+        else:
+            if "route" in scope:
+                span.name = f"{scope['method']} {scope['route'].path}"
+                span.set_attribute("http.route", scope["route"].path)
+            tracer.end_span(span)
+        finally:
+            tracer.deactivate(token)
+
+
+class TracedJSONResponse(JSONResponse):
+    """
+    JSON response with span around body encoding.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with tracer.span("response.encode"):
+            return super().render(content)
+
+
+class TracedRoute(APIRoute):
+    """
+    Route with spans around request handler and endpoint function.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        response_class = kwargs.get("response_class", Default(JSONResponse))
+        if (
+            isinstance(response_class, DefaultPlaceholder)
+            and response_class.value is JSONResponse
+        ):
+            kwargs["response_class"] = Default(TracedJSONResponse)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        endpoint = self.dependant.call
+        if not hasattr(endpoint, "__traced__"):
+
+            @functools.wraps(endpoint)  # type: ignore
+            async def traced_endpoint(*args: Any, **kwargs: Any) -> Any:
+                with tracer.span(f"endpoint {self.name}"):
+                    return await endpoint(*args, **kwargs)  # type: ignore
+
+            traced_endpoint.__traced__ = True  # type: ignore
+            self.dependant.call = traced_endpoint
+        handler = super().get_route_handler()
+
+        async def traced_handler(request: Request) -> Any:
+            with tracer.span(f"handler {self.path}"):
+                return await handler(request)
+
+        return traced_handler
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Adds span for every SQL statement executed by engine.
+    :param engine: synchronous engine (Engine)
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement_span(conn, cursor, statement, parameters, context, many):
+        if tracer.enabled and context is not None:
+            context._trace_span = tracer.start_span(
+                f"SQL {statement.split(None, 1)[0].upper()}",
+                attributes={"db.system": "postgresql", "db.statement": statement},
+            )
+            context._trace_span.kind = SPAN_KIND_CLIENT
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_statement_span(conn, cursor, statement, parameters, context, many):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            tracer.end_span(span)
+            context._trace_span = None
+
+    @event.listens_for(engine, "handle_error")
+    def end_failed_statement_span(exception_context):
+        context = exception_context.execution_context
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            tracer.end_span(span, exception_context.original_exception)
+            context._trace_span = None
+
+
+@event.listens_for(Session, "before_commit")
+def start_commit_span(session: Session) -> None:
+    if tracer.enabled:
+        span = tracer.start_span("db.commit")
+        session.info["_trace_commit"] = (span, tracer.activate(span))
+
+
+@event.listens_for(Session, "after_commit")
+def end_commit_span(session: Session) -> None:
+    if "_trace_commit" in session.info:
+        span, token = session.info.pop("_trace_commit")
+        tracer.deactivate(token)
+        tracer.end_span(span)
+
+
+@event.listens_for(Session, "after_rollback")
+def end_failed_commit_span(session: Session) -> None:
+    if "_trace_commit" in session.info:
+        span, token = session.info.pop("_trace_commit")
+        tracer.deactivate(token)
+        span.status = "ERROR"
+        tracer.end_span(span)
@@ -0,0 +1,51 @@
+"""
+Measures order allocation time for large orders.
+
+    python -m benchmarks.allocation --lines 500 --warehouses 40
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.allocation import allocate, distance
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--warehouses", type=int, default=30)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    demand = {
+        id: rng.randint(1, 20) for id in rng.sample(range(args.products), args.lines)
+    }
+    stock = {
+        warehouse_id: {id: rng.randint(0, 100) for id in demand if rng.random() < 0.6}
+        for warehouse_id in range(args.warehouses)
+    }
+    distances = {
+        warehouse_id: distance(55.75, 37.62, rng.uniform(40, 70), rng.uniform(20, 60))
+        for warehouse_id in stock
+    }
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        allocations = allocate(demand, stock, distances)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(
+        f"lines={args.lines} warehouses={args.warehouses} "
+        f"used={len(allocations)} "
+        f"median={statistics.median(timings):.2f}ms "
+        f"p99={timings[int(len(timings) * 0.99) - 1]:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Measures size and CPU time of compressing a product listing with every
+available encoding at several levels. Brotli and zstd are measured when
+brotli and zstandard packages are installed.
+
+    python -m benchmarks.compression --products 20000
+"""
+
+import argparse
+import json
+import random
+import time
+import zlib
+from typing import Callable, Dict, Tuple
+
+from app.compression import COMPRESSORS, brotli, zstandard
+
+LEVELS = {"zstd": [1, 3, 19], "br": [1, 4, 11], "gzip": [1, 6, 9]}
+DECOMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+    "br": lambda data: brotli.decompress(data),
+    "gzip": lambda data: zlib.decompress(data, zlib.MAX_WBITS | 16),
+}
+
+
+def listing(products: int) -> bytes:
+    rng = random.Random(0)
+    return json.dumps(
+        {
+            "result": True,
+            "products": [
+                {
+                    "id": id,
+                    "name": f"Product {id}",
+                    "description": f"Description of product {id} "
+                    + " ".join(
+                        rng.choice(("red", "blue", "large", "small", "steel"))
+                        for _ in range(8)
+                    ),
+                    "price": round(rng.uniform(1, 1000), 2),
+                    "amount": rng.randint(0, 500),
+                }
+                for id in range(1, products + 1)
+            ],
+        },
+        separators=(",", ":"),
+    ).encode()
+
+
+def time_call(func: Callable, runs: int) -> Tuple[float, bytes]:
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = func()
+    return (time.perf_counter() - start) / runs, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    body = listing(args.products)
+    print(f"body {len(body) / 1e6:.2f}MB")
+    for encoding, levels in LEVELS.items():
+        if encoding not in COMPRESSORS:
+            print(f"{encoding:5} not installed")
+            continue
+        compressor, decompress = COMPRESSORS[encoding], DECOMPRESSORS[encoding]
+        for level in levels:
+
+            def compress() -> bytes:
+                instance = compressor(level)
+                return instance.compress(body) + instance.finish()
+
+            seconds, data = time_call(compress, args.runs)
+            decompress_seconds, _ = time_call(lambda: decompress(data), args.runs)
+            print(
+                f"{encoding:5} level={level:2} size={len(data) / 1e3:9.1f}KB "
+                f"ratio={len(body) / len(data):5.1f} "
+                f"compress={seconds * 1e3:7.1f}ms "
+                f"({len(body) / seconds / 1e6:6.1f}MB/s) "
+                f"decompress={decompress_seconds * 1e3:6.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compares order creation with a commit per order and with group commit.
+Concurrent clients create one product orders for a fixed time against the
+database from envs/dev.env. Tables are created in a separate schema which
+is dropped afterwards.
+
+    python -m benchmarks.group_commit
+    python -m benchmarks.group_commit --clients 64 --window 0.002
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List, Sequence
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.database import DB_URL
+from app.db.db_models import Base, Product
+from app.order_writer import OrderWriter
+from app.schemas import OrderRequestItem
+
+SCHEMA = "benchmark_group_commit"
+
+
+async def run_clients(
+    writer: OrderWriter, clients: int, duration: float, product_ids: Sequence[int]
+) -> List[float]:
+    latencies: List[float] = []
+    deadline = time.perf_counter() + duration
+
+    async def client(number: int) -> None:
+        rng = random.Random(number)
+        while time.perf_counter() < deadline:
+            items = [
+                OrderRequestItem(product_id=rng.choice(product_ids), product_amount=1)
+            ]
+            start = time.perf_counter()
+            await writer.create_order(items)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    return latencies
+
+
+async def benchmark(args: argparse.Namespace) -> None:
+    engine = create_async_engine(
+        DB_URL,
+        pool_size=args.pool_size,
+        max_overflow=0,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+    )
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.execute(text(f'DROP SCHEMA IF EXISTS "{SCHEMA}" CASCADE'))
+        await conn.execute(text(f'CREATE SCHEMA "{SCHEMA}"'))
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with session_factory() as session:
+            product_ids = (
+                await session.scalars(
+                    insert(Product).returning(Product.id),
+                    [
+                        {"name": f"Product {number}", "price": 1, "amount": 10**9}
+                        for number in range(args.products)
+                    ],
+                )
+            ).all()
+            await session.commit()
+
+        for label, window in (("per order", 0.0), ("group", args.window)):
+            writer = OrderWriter(session_factory, window, args.max_size)
+            await run_clients(writer, args.clients, 1.0, product_ids)
+            latencies = await run_clients(
+                writer, args.clients, args.duration, product_ids
+            )
+            latencies.sort()
+            p99 = latencies[int(0.99 * (len(latencies) - 1))]
+            print(
+                f"{label:10} {len(latencies) / args.duration:8.0f} orders/s "
+                f"p50={statistics.median(latencies) * 1e3:6.1f}ms "
+                f"p99={p99 * 1e3:6.1f}ms"
+            )
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP SCHEMA "{SCHEMA}" CASCADE'))
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--window", type=float, default=0.002)
+    parser.add_argument("--max-size", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=15)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares per-call overhead of building statements on every call with
+prebuilt statements of app.db.repository. Without --db only statement
+construction and cache key generation are measured, with --db queries
+are also executed against the database from envs/dev.env.
+
+    python -m benchmarks.statements
+    python -m benchmarks.statements --db
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Callable, Dict
+
+from sqlalchemy import Select
+from sqlalchemy.future import select
+from sqlalchemy.orm import configure_mappers, selectinload
+
+from app.db import repository
+from app.db.database import async_session, engine
+from app.db.db_models import Order, Product
+
+BUILDERS: Dict[str, Callable[[], Select]] = {
+    "product_by_id": lambda: select(Product).filter(Product.id == 1),
+    "order_by_id": lambda: (
+        select(Order).options(selectinload(Order.order_products)).filter(Order.id == 1)
+    ),
+    "products": lambda: select(Product),
+}
+PREBUILT: Dict[str, Select] = {
+    "product_by_id": repository.PRODUCT_BY_ID,
+    "order_by_id": repository.ORDER_BY_ID,
+    "products": repository.PRODUCTS,
+}
+
+
+def time_per_call(func: Callable, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+async def time_queries(runs: int) -> None:
+    async with async_session() as session:
+        for name in ("product_by_id", "order_by_id"):
+            timings = {}
+            getters: Dict[str, Callable[[], Select]] = {
+                "built": BUILDERS[name],
+                "prebuilt": lambda: PREBUILT[name],
+            }
+            for label, get in getters.items():
+                await session.execute(get(), {"id": 1})
+                start = time.perf_counter()
+                for _ in range(runs):
+                    await session.execute(get(), {"id": 1})
+                timings[label] = (time.perf_counter() - start) / runs * 1e6
+            print(
+                f"{name:14} query  built={timings['built']:8.1f}us "
+                f"prebuilt={timings['prebuilt']:8.1f}us"
+            )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--db", action="store_true")
+    args = parser.parse_args()
+
+    configure_mappers()
+    for name, build in BUILDERS.items():
+        statement = PREBUILT[name]
+        built = time_per_call(lambda: build()._generate_cache_key(), args.runs)
+        prebuilt = time_per_call(lambda: statement._generate_cache_key(), args.runs)
+        print(f"{name:14} build  built={built:8.1f}us prebuilt={prebuilt:8.1f}us")
+    if args.db:
+        asyncio.run(time_queries(args.runs // 10))
+
+
+if __name__ == "__main__":
+    main()
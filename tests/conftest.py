@@ -4,11 +4,15 @@ from typing import AsyncGenerator
 import pytest
 from dotenv import load_dotenv
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from app.db.database import get_session
 from app.db.db_models import Base
 from app.main import app
+from app.order_writer import order_writer
+from app.tracing import instrument_engine
+from tests.factories import create_orders, create_products
 
 load_dotenv("envs/dev.env", override=True)
 DB_HOST = os.getenv("POSTGRES_HOST")
@@ -17,54 +21,74 @@ DB_PASS = os.getenv("POSTGRES_PASSWORD")
 DB_NAME = os.getenv("POSTGRES_DB")
 
 TEST_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
+# Every pytest-xdist worker gets its own schema, so workers never share rows.
+TEST_SCHEMA = f"test_{os.getenv('PYTEST_XDIST_WORKER', 'master')}"
 
-test_engine = create_async_engine(TEST_DATABASE_URL)
-test_async_session = async_sessionmaker(bind=test_engine, expire_on_commit=False)
-test_async_client = AsyncClient(
-    transport=ASGITransport(app=app), base_url="http://localhost/api/v1"
+test_engine = create_async_engine(
+    TEST_DATABASE_URL,
+    connect_args={"server_settings": {"search_path": TEST_SCHEMA}},
 )
+instrument_engine(test_engine.sync_engine)
 
 
-async def override_get_session() -> AsyncGenerator:
-    """
-    Test database session generator
-    :return: Asynchronous session
-    :rtype: AsyncSession
-    """
-    async with test_async_session() as session:
-        yield session
-
-
-app.dependency_overrides[get_session] = override_get_session
-
-
-def pytest_collection_modifyitems(items):
-    """Orders start of test modules."""
-    run_first = ["tests.test_products_routes", "tests.test_orders_routes"]
-    modules = {item: item.module.__name__ for item in items}
-    items[:] = sorted(
-        items,
-        key=lambda x: (
-            run_first.index(modules[x]) if modules[x] in run_first else len(items)
-        ),
-    )
-
-
-@pytest.fixture(autouse=True, scope="package")
+@pytest.fixture(autouse=True, scope="session")
 async def create_test_db():
     """
-    Creates tables in test database.
+    Creates test schema with tables for current worker.
     """
     async with test_engine.begin() as conn:
+        await conn.execute(text(f'DROP SCHEMA IF EXISTS "{TEST_SCHEMA}" CASCADE'))
+        await conn.execute(text(f'CREATE SCHEMA "{TEST_SCHEMA}"'))
         await conn.run_sync(Base.metadata.create_all)
     yield
     async with test_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
+        await conn.execute(text(f'DROP SCHEMA "{TEST_SCHEMA}" CASCADE'))
     await test_engine.dispose()
 
 
 @pytest.fixture()
-async def test_client():
+async def test_connection():
+    """
+    Provides connection with transaction rolled back after test.
+    """
+    async with test_engine.connect() as connection:
+        transaction = await connection.begin()
+        yield connection
+        await transaction.rollback()
+
+
+@pytest.fixture()
+async def test_session(test_connection):
+    """
+    Provides test session. Sessions of the app are bound to the same
+    connection, their commits only release savepoints.
+    """
+    test_async_session = async_sessionmaker(
+        bind=test_connection,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
+
+    async def override_get_session() -> AsyncGenerator:
+        """
+        Test database session generator
+        :return: Asynchronous session
+        :rtype: AsyncSession
+        """
+        async with test_async_session() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    session_factory = order_writer.session_factory
+    order_writer.session_factory = test_async_session
+    async with test_async_session() as test_session:
+        yield test_session
+    app.dependency_overrides.pop(get_session, None)
+    order_writer.session_factory = session_factory
+
+
+@pytest.fixture()
+async def test_client(test_session):
     """
     Provides test client.
     """
@@ -75,9 +99,16 @@ async def test_client():
 
 
 @pytest.fixture()
-async def test_session():
+async def product(test_session):
     """
-    Provides test session.
+    Provides product stored in test database.
     """
-    async with test_async_session() as test_session:
-        yield test_session
+    return (await create_products(test_session))[0]
+
+
+@pytest.fixture()
+async def order(test_session, product):
+    """
+    Provides order with one product stored in test database.
+    """
+    return (await create_orders(test_session, products=[product]))[0]
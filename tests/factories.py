@@ -0,0 +1,114 @@
+import itertools
+from typing import Any, List, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.db_models import Order, OrderItem, Product, Warehouse, WarehouseStock
+
+MISSING_ID = 999999999
+
+_sequence = itertools.count(1)
+
+
+async def create_products(
+    session: AsyncSession, count: int = 1, **fields: Any
+) -> List[Product]:
+    """
+    Inserts products with one statement.
+    :param session: Asynchronous session (AsyncSession)
+    :param count: number of products (int)
+    :param fields: values overriding generated ones
+    :return: List[Product]
+    """
+    rows = []
+    for number in itertools.islice(_sequence, count):
+        rows.append(
+            {
+                "name": f"Product {number}",
+                "description": f"Description {number}",
+                "price": 100 + number,
+                "amount": 10,
+                **fields,
+            }
+        )
+    res = await session.scalars(insert(Product).returning(Product), rows)
+    return list(res.all())
+
+
+async def create_orders(
+    session: AsyncSession,
+    products: Sequence[Product],
+    count: int = 1,
+    amount: int = 1,
+    **fields: Any,
+) -> List[Order]:
+    """
+    Inserts orders, each with all given products, with two statements.
+    Product amounts are left as they are.
+    :param session: Asynchronous session (AsyncSession)
+    :param products: products of every order (Sequence[Product])
+    :param count: number of orders (int)
+    :param amount: amount of every product in order (int)
+    :param fields: values overriding defaults of orders
+    :return: List[Order]
+    """
+    res = await session.scalars(
+        insert(Order).returning(Order),
+        [{"status": "processing", **fields} for _ in range(count)],
+    )
+    orders = list(res.all())
+    await session.execute(
+        insert(OrderItem),
+        [
+            {"order_id": order.id, "product_id": product.id, "amount": amount}
+            for order in orders
+            for product in products
+        ],
+    )
+    return orders
+
+
+async def create_warehouses(
+    session: AsyncSession, count: int = 1, **fields: Any
+) -> List[Warehouse]:
+    """
+    Inserts warehouses with one statement.
+    :param session: Asynchronous session (AsyncSession)
+    :param count: number of warehouses (int)
+    :param fields: values overriding generated ones
+    :return: List[Warehouse]
+    """
+    rows = [
+        {"name": f"Warehouse {number}", **fields}
+        for number in itertools.islice(_sequence, count)
+    ]
+    res = await session.scalars(insert(Warehouse).returning(Warehouse), rows)
+    return list(res.all())
+
+
+async def create_stock(
+    session: AsyncSession,
+    warehouses: Sequence[Warehouse],
+    products: Sequence[Product],
+    amount: int = 10,
+) -> None:
+    """
+    Puts given amount of every product to every warehouse with one statement.
+    Product amounts are raised by the stock put, as warehouse restocks do.
+    :param session: Asynchronous session (AsyncSession)
+    :param warehouses: warehouses (Sequence[Warehouse])
+    :param products: products (Sequence[Product])
+    :param amount: amount of every product in every warehouse (int)
+    """
+    await session.execute(
+        insert(WarehouseStock),
+        [
+            {"warehouse_id": warehouse.id, "product_id": product.id, "amount": amount}
+            for warehouse in warehouses
+            for product in products
+        ],
+    )
+    for product in products:
+        product.amount += amount * len(warehouses)  # type: ignore
+    await session.flush()
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.admission import AdmissionControlMiddleware, PriorityLimiter, RoutePolicy
+
+ORDER_WRITE = RoutePolicy("order_write", 0, 2, 10, 1.0)
+READ = RoutePolicy("read", 2, 1, 1, 0.1)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_limiter_priority_ok():
+    limiter = PriorityLimiter(capacity=1)
+    assert await limiter.acquire(READ) is True
+    granted = []
+
+    async def wait_for_slot(policy):
+        await limiter.acquire(policy)
+        granted.append(policy.name)
+        limiter.release(policy)
+
+    read_task = asyncio.create_task(wait_for_slot(READ))
+    order_task = asyncio.create_task(wait_for_slot(ORDER_WRITE))
+    await asyncio.sleep(0)
+    limiter.release(READ)
+    await asyncio.gather(read_task, order_task)
+    assert granted == ["order_write", "read"]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_limiter_fail():
+    limiter = PriorityLimiter(capacity=2)
+    assert await limiter.acquire(READ) is True
+    waiter = asyncio.create_task(limiter.acquire(READ))
+    await asyncio.sleep(0)
+    assert await limiter.acquire(READ) is False
+    assert await waiter is False
+    assert limiter.in_use == 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_middleware_rejects_with_fail_response():
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.get("/api/v1/products")
+    async def slow():
+        await release.wait()
+        return {"result": True}
+
+    app.add_middleware(AdmissionControlMiddleware, capacity=1, policies=[READ])
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://localhost"
+    ) as client:
+        first = asyncio.create_task(client.get("/api/v1/products"))
+        await asyncio.sleep(0.01)
+        response = await client.get("/api/v1/products")
+        release.set()
+        assert (await first).status_code == 200
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["result"] is False
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_middleware_default_policies_ok():
+    app = FastAPI()
+
+    @app.post("/api/v1/orders")
+    async def create():
+        return {"result": True}
+
+    app.add_middleware(AdmissionControlMiddleware, capacity=1, policies=[READ])
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://localhost"
+    ) as client:
+        response = await client.post("/api/v1/orders")
+    assert response.status_code == 200
@@ -0,0 +1,34 @@
+from app.allocation import allocate, take_allocation
+
+
+def test_allocate_fewest_warehouses():
+    stock = {
+        1: {10: 5},
+        2: {11: 5},
+        3: {10: 5, 11: 5},
+    }
+    assert allocate({10: 2, 11: 3}, stock) == {3: {10: 2, 11: 3}}
+
+
+def test_allocate_split():
+    stock = {1: {10: 3}, 2: {10: 1}, 3: {10: 2}}
+    assert allocate({10: 5}, stock) == {1: {10: 3}, 3: {10: 2}}
+
+
+def test_allocate_nearest():
+    stock = {1: {10: 9}, 2: {10: 5}}
+    assert allocate({10: 2}, stock) == {1: {10: 2}}
+    assert allocate({10: 2}, stock, distances={1: 500.0, 2: 20.0}) == {2: {10: 2}}
+
+
+def test_allocate_not_enough():
+    stock = {1: {10: 1}, 2: {11: 1}}
+    assert allocate({10: 3, 12: 1}, stock) == {1: {10: 1}}
+
+
+def test_take_allocation():
+    allocated = {1: 3, 2: 2}
+    assert take_allocation(allocated, 4) == {1: 3, 2: 1}
+    assert allocated == {2: 1}
+    assert take_allocation(allocated, 2) == {2: 1}
+    assert allocated == {}
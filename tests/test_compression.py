@@ -0,0 +1,81 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.compression import CompressionMiddleware, GzipCompressor, negotiate
+
+
+@pytest.fixture()
+async def client():
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large():
+        return {"items": [{"id": id, "name": f"Product {id}"} for id in range(200)]}
+
+    @app.get("/small")
+    async def small():
+        return {"result": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for number in range(100):
+                yield f"line {number}\n".encode()
+
+        return StreamingResponse(lines())
+
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=500, compressors={"gzip": GzipCompressor}
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://localhost"
+    ) as client:
+        yield client
+
+
+def test_negotiate_ok():
+    available = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, br", available) == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", available) == "gzip"
+    assert negotiate("*", available) == "zstd"
+    assert negotiate("br;q=0, gzip", available) == "gzip"
+    assert negotiate("identity", available) is None
+    assert negotiate("", available) is None
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_large_response_compressed(client):
+    response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()["items"]) == 200
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_small_response_not_compressed(client):
+    response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    response = await client.get("/large", headers={"Accept-Encoding": ""})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_streamed_response_compressed(client):
+    async with client.stream(
+        "GET", "/stream", headers={"Accept-Encoding": "gzip"}
+    ) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    assert gzip.decompress(body).decode().splitlines()[-1] == "line 99"
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert
+from sqlalchemy.future import select
+
+from app.db.db_models import StockMovement, StockSnapshot
+from app.ledger import get_stock_at, record_opening_stock, take_snapshots
+from tests.factories import MISSING_ID, create_products
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_ledger_records_changes(test_client, test_session, product):
+    await record_opening_stock(test_session)
+    response = await test_client.put(f"/products/{product.id}", json={"amount": 15})
+    assert response.status_code == 200
+    response = await test_client.post(
+        "/orders", json=[{"product_id": product.id, "product_amount": 3}]
+    )
+    assert response.status_code == 201
+    order_id = response.json()["order_id"]
+    response = await test_client.post(
+        "/orders", json=[{"product_id": product.id, "product_amount": 100}]
+    )
+    assert response.status_code == 422
+    res = await test_session.execute(
+        select(StockMovement.reason, StockMovement.delta, StockMovement.order_id)
+        .filter(StockMovement.product_id == product.id)
+        .order_by(StockMovement.id)
+    )
+    assert res.tuples().all() == [
+        ("opening", 10, None),
+        ("edit", 5, None),
+        ("order", -3, order_id),
+    ]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_stock_at_uses_snapshots(test_session):
+    product, other = await create_products(test_session, count=2)
+    start = datetime(2024, 1, 1)
+    hour = timedelta(hours=1)
+
+    async def add_movements(movements):
+        await test_session.execute(
+            insert(StockMovement),
+            [
+                {"product_id": id, "delta": delta, "reason": "edit", "created_at": at}
+                for id, delta, at in movements
+            ],
+        )
+
+    await add_movements(
+        [(product.id, 10, start), (product.id, -4, start + hour), (other.id, 7, start)]
+    )
+    await take_snapshots(test_session)
+    first = await test_session.scalar(select(func.max(StockSnapshot.taken_at)))
+    await add_movements([(product.id, 6, first + hour)])
+    await take_snapshots(test_session)
+    await take_snapshots(test_session)
+    res = await test_session.execute(
+        select(StockSnapshot.amount)
+        .filter(StockSnapshot.product_id == product.id)
+        .order_by(StockSnapshot.taken_at)
+    )
+    assert res.scalars().all() == [6, 12]
+
+    for at, amount in (
+        (start - hour, 0),
+        (start + timedelta(minutes=30), 10),
+        (first, 6),
+        (first + hour, 12),
+        (None, 12),
+    ):
+        assert await get_stock_at(test_session, product.id, at) == amount
+    assert await get_stock_at(test_session, other.id, start) == 7
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_product_stock_at(test_client, test_session, product):
+    await record_opening_stock(test_session)
+    response = await test_client.get(f"/products/{product.id}/stock")
+    assert response.status_code == 200
+    assert response.json()["result"] is True
+    assert response.json()["amount"] == product.amount
+    response = await test_client.delete(f"/products/{product.id}")
+    assert response.status_code == 200
+    response = await test_client.get(f"/products/{product.id}/stock")
+    assert response.status_code == 200
+    assert response.json()["amount"] == 0
+    response = await test_client.get(f"/products/{MISSING_ID}/stock")
+    assert response.status_code == 404
+    assert response.json()["result"] is False
@@ -1,55 +1,119 @@
+import asyncio
+
 import pytest
 from sqlalchemy.future import select
 
+from app.db import repository
 from app.db.db_models import Order
+from app.order_writer import order_writer
+from tests.factories import MISSING_ID, create_products
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_add_order_ok(test_client, test_session):
+async def test_add_order_ok(test_client, test_session, product):
     orders_number = len((await test_session.execute(select(Order))).scalars().all())
+    amount = product.amount
     response = await test_client.post(
-        "/orders", json=[{"product_id": 1, "product_amount": 1}]
+        "/orders", json=[{"product_id": product.id, "product_amount": 1}]
     )
     assert response.status_code == 201
     assert response.json()["result"] is True
     new_orders_number = len((await test_session.execute(select(Order))).scalars().all())
     assert new_orders_number - orders_number == 1
+    product_id = product.id
+    test_session.expire(product)
+    product = await repository.get_product_by_id(session=test_session, id=product_id)
+    assert product.amount == amount - 1
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_add_order_fail(test_client, test_session):
+async def test_add_order_fail(test_client, test_session, product):
     response = await test_client.post(
-        "/orders", json=[{"product_id": 8, "product_amount": 1}]
+        "/orders", json=[{"product_id": MISSING_ID, "product_amount": 1}]
     )
     assert response.status_code == 404
     assert response.json()["result"] is False
 
     response = await test_client.post(
-        "/orders", json=[{"product_id": 1, "product_amount": 100}]
+        "/orders", json=[{"product_id": product.id, "product_amount": 100}]
     )
     assert response.status_code == 422
     assert response.json()["result"] is False
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_get_orders_ok(test_client, test_session):
+async def test_add_orders_group_commit(test_client, test_session, monkeypatch):
+    monkeypatch.setattr(order_writer, "window", 0.01)
+    first, second = await create_products(test_session, count=2, amount=5)
+    responses = await asyncio.gather(
+        *(
+            test_client.post(
+                "/orders", json=[{"product_id": id, "product_amount": amount}]
+            )
+            for id, amount in (
+                (first.id, 2),
+                (first.id, 100),
+                (MISSING_ID, 1),
+                (second.id, 3),
+                (first.id, 3),
+            )
+        )
+    )
+    statuses = [response.status_code for response in responses]
+    assert statuses == [201, 422, 404, 201, 201]
+    order_ids = [responses[index].json()["order_id"] for index in (0, 3, 4)]
+    assert (
+        len(await repository.get_orders_by_ids(session=test_session, ids=order_ids))
+        == 3
+    )
+    product_ids = [first.id, second.id]
+    test_session.expire_all()
+    products = await repository.get_products_by_ids(
+        session=test_session, ids=product_ids
+    )
+    assert sorted(product.amount for product in products) == [0, 2]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_orders_ok(test_client, test_session, order):
     response = await test_client.get("/orders")
     assert response.status_code == 200
     assert response.json()["result"] is True
-    assert response.json()["orders"][0]["id"]
+    assert order.id in [item["id"] for item in response.json()["orders"]]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_orders_fields_ok(test_client, test_session, order, product):
+    response = await test_client.get("/orders", params={"fields": "id,order_products"})
+    assert response.status_code == 200
+    assert response.json()["result"] is True
+    item = next(i for i in response.json()["orders"] if i["id"] == order.id)
+    assert set(item) == {"id", "order_products"}
+    assert item["order_products"][0]["product"] == {
+        "id": product.id,
+        "name": product.name,
+        "price": float(product.price),
+    }
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_orders_fields_fail(test_client, test_session):
+    response = await test_client.get("/orders", params={"fields": "description"})
+    assert response.status_code == 422
+    assert response.json()["result"] is False
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_get_order_by_id_ok(test_client, test_session):
-    response = await test_client.get("/orders/1")
+async def test_get_order_by_id_ok(test_client, test_session, order):
+    response = await test_client.get(f"/orders/{order.id}")
     assert response.status_code == 200
     assert response.json()["result"] is True
-    assert response.json()["order"]["id"] == 1
+    assert response.json()["order"]["id"] == order.id
 
 
 @pytest.mark.asyncio(loop_scope="session")
 async def test_get_order_by_id_fail(test_client, test_session):
-    response = await test_client.get("/orders/8")
+    response = await test_client.get(f"/orders/{MISSING_ID}")
     assert response.status_code == 404
     assert response.json()["result"] is False
     response = await test_client.get("/orders/test")
@@ -58,24 +122,45 @@ async def test_get_order_by_id_fail(test_client, test_session):
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_change_order_status_by_id_ok(test_client, test_session):
-    order = await Order.get_order_by_id(session=test_session, id=1)
+async def test_get_orders_batch_ok(test_client, test_session, order):
+    response = await test_client.get(
+        "/orders/batch", params={"ids": [order.id, MISSING_ID]}
+    )
+    assert response.status_code == 200
+    assert response.json()["result"] is True
+    assert [item["id"] for item in response.json()["orders"]] == [order.id]
+    assert response.json()["missing_ids"] == [MISSING_ID]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_orders_batch_fail(test_client, test_session):
+    response = await test_client.get("/orders/batch")
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+    response = await test_client.get("/orders/batch", params={"ids": "test"})
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_change_order_status_by_id_ok(test_client, test_session, order):
     order_status = order.status
     new_status = "sent"
-    response = await test_client.patch("/orders/1/status", json=new_status)
+    response = await test_client.patch(f"/orders/{order.id}/status", json=new_status)
     assert response.status_code == 200
     assert response.json()["result"] is True
+    order_id = order.id
     test_session.expire(order)
-    order = await Order.get_order_by_id(session=test_session, id=1)
+    order = await repository.get_order_by_id(session=test_session, id=order_id)
     assert order.status == new_status
     assert order_status != new_status
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_change_order_status_by_id_fail(test_client, test_session):
-    response = await test_client.patch("/orders/8/status", json="sent")
+async def test_change_order_status_by_id_fail(test_client, test_session, order):
+    response = await test_client.patch(f"/orders/{MISSING_ID}/status", json="sent")
     assert response.status_code == 404
     assert response.json()["result"] is False
-    response = await test_client.patch("/orders/1/status", json="test")
+    response = await test_client.patch(f"/orders/{order.id}/status", json="test")
     assert response.status_code == 422
     assert response.json()["result"] is False
@@ -1,7 +1,10 @@
 import pytest
 from sqlalchemy.future import select
 
+from app import caching
+from app.db import repository
 from app.db.db_models import Product
+from tests.factories import MISSING_ID
 
 
 @pytest.mark.asyncio(loop_scope="session")
@@ -20,34 +23,63 @@ async def test_add_product_ok(test_client, test_session):
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_add_product_fail(test_client, test_session):
+async def test_add_product_fail(test_client, test_session, product):
     response = await test_client.post(
         "/products",
         json={"name": 100, "description": "330XD", "price": 10000, "amount": 2},
     )
     assert response.status_code == 422
     assert response.json()["result"] is False
+    response = await test_client.post(
+        "/products",
+        json={
+            "name": product.name,
+            "description": "330XD",
+            "price": float(product.price),
+            "amount": 2,
+        },
+    )
+    assert response.status_code == 422
+    assert response.json()["result"] is False
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_get_products_ok(test_client, test_session):
+async def test_get_products_ok(test_client, test_session, product):
     response = await test_client.get("/products")
     assert response.status_code == 200
     assert response.json()["result"] is True
-    assert response.json()["products"][0]["id"]
+    assert product.id in [item["id"] for item in response.json()["products"]]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_products_fields_ok(test_client, test_session, product):
+    response = await test_client.get("/products", params={"fields": "id,price"})
+    assert response.status_code == 200
+    assert response.json()["result"] is True
+    assert {"id": product.id, "price": float(product.price)} in response.json()[
+        "products"
+    ]
+    assert all(set(item) == {"id", "price"} for item in response.json()["products"])
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_products_fields_fail(test_client, test_session):
+    response = await test_client.get("/products", params={"fields": "id,test"})
+    assert response.status_code == 422
+    assert response.json()["result"] is False
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_get_product_by_id_ok(test_client, test_session):
-    response = await test_client.get("/products/1")
+async def test_get_product_by_id_ok(test_client, test_session, product):
+    response = await test_client.get(f"/products/{product.id}")
     assert response.status_code == 200
     assert response.json()["result"] is True
-    assert response.json()["product"]["id"] == 1
+    assert response.json()["product"]["id"] == product.id
 
 
 @pytest.mark.asyncio(loop_scope="session")
 async def test_get_product_by_id_fail(test_client, test_session):
-    response = await test_client.get("/products/8")
+    response = await test_client.get(f"/products/{MISSING_ID}")
     assert response.status_code == 404
     assert response.json()["result"] is False
     response = await test_client.get("/products/test")
@@ -56,49 +88,107 @@ async def test_get_product_by_id_fail(test_client, test_session):
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_edit_product_by_id_ok(test_client, test_session):
-    product = await Product.get_product_by_id(session=test_session, id=1)
+async def test_get_product_cache_control(
+    test_client, test_session, product, monkeypatch
+):
+    monkeypatch.setattr(caching, "CATALOG_CACHE_CONTROL", "public, max-age=10")
+    response = await test_client.get(f"/products/{product.id}")
+    assert response.headers["cache-control"] == "public, max-age=10"
+    response = await test_client.get("/products")
+    assert response.headers["cache-control"] == "public, max-age=10"
+    response = await test_client.get(f"/products/{MISSING_ID}")
+    assert response.status_code == 404
+    assert "cache-control" not in response.headers
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_products_batch_ok(test_client, test_session, product):
+    response = await test_client.get(
+        "/products/batch", params={"ids": [product.id, MISSING_ID, product.id]}
+    )
+    assert response.status_code == 200
+    assert response.json()["result"] is True
+    assert [item["id"] for item in response.json()["products"]] == [product.id]
+    assert response.json()["missing_ids"] == [MISSING_ID]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_products_batch_fail(test_client, test_session):
+    response = await test_client.get("/products/batch")
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+    response = await test_client.get(
+        "/products/batch", params={"ids": list(range(1, 102))}
+    )
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_edit_product_by_id_ok(test_client, test_session, product):
     assert product.amount != 8
-    response = await test_client.put("/products/1", json={"amount": 8})
+    response = await test_client.put(f"/products/{product.id}", json={"amount": 8})
     assert response.status_code == 200
     assert response.json()["result"] is True
     assert response.json()["product"]["amount"] == 8
+    product_id = product.id
     test_session.expire(product)
-    product = await Product.get_product_by_id(session=test_session, id=1)
+    product = await repository.get_product_by_id(session=test_session, id=product_id)
     assert product.amount == 8
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_edit_product_by_id_fail(test_client, test_session):
-    response = await test_client.put("/products/8", json={"amount": 8})
+async def test_edit_product_by_id_fail(test_client, test_session, product):
+    response = await test_client.put(f"/products/{MISSING_ID}", json={"amount": 8})
     assert response.status_code == 404
     assert response.json()["result"] is False
-    response = await test_client.put("/products/1", json={"test": 8})
+    response = await test_client.put(f"/products/{product.id}", json={"test": 8})
     assert response.status_code == 422
     assert response.json()["result"] is False
 
 
 @pytest.mark.asyncio(loop_scope="session")
-async def test_delete_product_by_id_ok(test_client, test_session):
-    response = await test_client.post(
+async def test_edit_products_batch_ok(test_client, test_session, product):
+    amount = product.amount
+    response = await test_client.patch(
         "/products",
-        json={"name": "E92", "description": "335D", "price": 20000, "amount": 1},
+        json=[{"id": product.id, "price": 12000}, {"id": MISSING_ID, "amount": 3}],
     )
-    new_product_id = response.json()["product_id"]
+    assert response.status_code == 200
+    assert response.json()["result"] is True
+    assert response.json()["updated_ids"] == [product.id]
+    assert response.json()["missing_ids"] == [MISSING_ID]
+    product_id = product.id
+    test_session.expire(product)
+    product = await repository.get_product_by_id(session=test_session, id=product_id)
+    assert product.price == 12000
+    assert product.amount == amount
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_edit_products_batch_fail(test_client, test_session, product):
+    response = await test_client.patch("/products", json=[{"id": product.id}])
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+    response = await test_client.patch("/products", json=[])
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_delete_product_by_id_ok(test_client, test_session, product):
     products = (await test_session.execute(select(Product))).scalars().all()
-    products_ids = [product.id for product in products]
-    assert new_product_id in products_ids
-    response = await test_client.delete(f"/products/{new_product_id}")
+    assert product.id in [item.id for item in products]
+    response = await test_client.delete(f"/products/{product.id}")
     assert response.status_code == 200
     assert response.json()["result"] is True
     products = (await test_session.execute(select(Product))).scalars().all()
-    products_ids = [product.id for product in products]
-    assert new_product_id not in products_ids
+    assert product.id not in [item.id for item in products]
 
 
 @pytest.mark.asyncio(loop_scope="session")
 async def test_delete_product_by_id_fail(test_client, test_session):
-    response = await test_client.delete("/products/8")
+    response = await test_client.delete(f"/products/{MISSING_ID}")
     assert response.status_code == 404
     assert response.json()["result"] is False
     response = await test_client.delete("/products/test")
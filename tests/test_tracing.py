@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from app.tracing import FileExporter, InMemoryExporter, Tracer, tracer
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+PARENT_ID = "b7ad6b7169203331"
+
+
+@pytest.fixture()
+def exporter():
+    """
+    Provides in-memory exporter installed into app tracer.
+    """
+    exporter = tracer.exporter = InMemoryExporter()
+    yield exporter
+    tracer.exporter = None
+
+
+def test_extract_ok():
+    parent = Tracer.extract({"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    assert parent.trace_id == TRACE_ID
+    assert parent.span_id == PARENT_ID
+    assert parent.sampled is True
+
+
+def test_extract_fail():
+    assert Tracer.extract({}) is None
+    assert Tracer.extract({"traceparent": "test"}) is None
+    assert Tracer.extract({"traceparent": f"00-{'0' * 32}-{PARENT_ID}-01"}) is None
+
+
+def test_sampling():
+    exporter = InMemoryExporter()
+    with Tracer(exporter, sample_ratio=0.0).span("root") as root:
+        assert root.sampled is False
+    with Tracer(exporter, sample_ratio=1.0).span("root") as root:
+        assert root.sampled is True
+    assert [span.name for span in exporter.spans] == ["root"]
+
+
+def test_nested_spans(exporter):
+    with tracer.span("parent") as parent:
+        with tracer.span("child") as child:
+            pass
+    assert child.trace_id == parent.trace_id
+    assert child.parent_id == parent.span_id
+    assert [span.name for span in exporter.spans] == ["child", "parent"]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_request_spans(test_client, test_session, product, exporter):
+    response = await test_client.get(
+        f"/products/{product.id}",
+        headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+    )
+    assert response.status_code == 200
+    assert response.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
+    names = [span.name for span in exporter.spans]
+    assert "GET /api/v1/products/{id}" in names
+    assert "endpoint get_product_by_id" in names
+    assert "SQL SELECT" in names
+    assert "response.encode" in names
+    assert all(span.trace_id == TRACE_ID for span in exporter.spans)
+    root = exporter.spans[-1]
+    assert root.parent_id == PARENT_ID
+
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    file_tracer = Tracer(FileExporter(str(path)))
+    with pytest.raises(ValueError):
+        with file_tracer.span("root"):
+            with file_tracer.span("child", key="value"):
+                raise ValueError
+    file_tracer.shutdown()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1
+    scope_spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"]
+    spans = scope_spans[0]["spans"]
+    assert [span["name"] for span in spans] == ["child", "root"]
+    assert spans[0]["status"] == {"code": 2}
+    assert spans[0]["parentSpanId"] == spans[1]["spanId"]
+    assert spans[0]["attributes"][0]["key"] == "key"
@@ -0,0 +1,136 @@
+import pytest
+from sqlalchemy.future import select
+
+from app.db import repository
+from app.db.db_models import WarehouseStock
+from tests.factories import MISSING_ID, create_stock, create_warehouses
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_add_warehouse_ok(test_client, test_session):
+    response = await test_client.post(
+        "/warehouses", json={"name": "North", "latitude": 59.9, "longitude": 30.3}
+    )
+    assert response.status_code == 201
+    assert response.json()["result"] is True
+    warehouse = await repository.get_warehouse_by_id(
+        session=test_session, id=response.json()["warehouse_id"]
+    )
+    assert warehouse.name == "North"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_add_warehouse_fail(test_client, test_session):
+    warehouse = (await create_warehouses(test_session))[0]
+    response = await test_client.post("/warehouses", json={"name": warehouse.name})
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+    response = await test_client.post(
+        "/warehouses", json={"name": "South", "latitude": 100}
+    )
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_warehouses_ok(test_client, test_session):
+    warehouse = (await create_warehouses(test_session))[0]
+    response = await test_client.get("/warehouses")
+    assert response.status_code == 200
+    assert response.json()["result"] is True
+    assert warehouse.id in [item["id"] for item in response.json()["warehouses"]]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_set_warehouse_stock_ok(test_client, test_session, product):
+    warehouse = (await create_warehouses(test_session))[0]
+    amount = product.amount
+    response = await test_client.put(
+        f"/warehouses/{warehouse.id}/stock",
+        json=[{"product_id": product.id, "amount": 4}],
+    )
+    assert response.status_code == 200
+    assert response.json()["result"] is True
+    response = await test_client.put(
+        f"/warehouses/{warehouse.id}/stock",
+        json=[{"product_id": product.id, "amount": 3}],
+    )
+    assert response.status_code == 200
+    stock = await test_session.scalar(
+        select(WarehouseStock.amount).filter(
+            WarehouseStock.warehouse_id == warehouse.id,
+            WarehouseStock.product_id == product.id,
+        )
+    )
+    assert stock == 3
+    product_id = product.id
+    test_session.expire(product)
+    product = await repository.get_product_by_id(session=test_session, id=product_id)
+    assert product.amount == amount + 3
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_set_warehouse_stock_fail(test_client, test_session, product):
+    warehouse = (await create_warehouses(test_session))[0]
+    response = await test_client.put(
+        f"/warehouses/{MISSING_ID}/stock",
+        json=[{"product_id": product.id, "amount": 1}],
+    )
+    assert response.status_code == 404
+    assert response.json()["result"] is False
+    response = await test_client.put(
+        f"/warehouses/{warehouse.id}/stock",
+        json=[{"product_id": MISSING_ID, "amount": 1}],
+    )
+    assert response.status_code == 404
+    assert response.json()["result"] is False
+    response = await test_client.put(
+        f"/warehouses/{warehouse.id}/stock",
+        json=[{"product_id": product.id, "amount": -1}],
+    )
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_add_order_allocation_ok(test_client, test_session, product):
+    far, near = await create_warehouses(test_session, count=2, latitude=0.0)
+    far.longitude, near.longitude = 90.0, 1.0
+    await test_session.flush()
+    await create_stock(test_session, warehouses=[far, near], products=[product])
+    response = await test_client.post(
+        "/orders",
+        params={"latitude": 0, "longitude": 0},
+        json=[{"product_id": product.id, "product_amount": 2}],
+    )
+    assert response.status_code == 201
+    response = await test_client.get(f"/orders/{response.json()['order_id']}")
+    item = response.json()["order"]["order_products"][0]
+    assert item["allocations"] == [{"warehouse_id": near.id, "amount": 2}]
+    stock = await test_session.scalar(
+        select(WarehouseStock.amount).filter(
+            WarehouseStock.warehouse_id == near.id,
+            WarehouseStock.product_id == product.id,
+        )
+    )
+    assert stock == 8
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_edit_product_below_warehouse_stock_fail(
+    test_client, test_session, product
+):
+    warehouses = await create_warehouses(test_session, count=2)
+    await create_stock(
+        test_session, warehouses=warehouses, products=[product], amount=4
+    )
+    response = await test_client.put(f"/products/{product.id}", json={"amount": 7})
+    assert response.status_code == 422
+    assert response.json()["result"] is False
+    response = await test_client.patch(
+        "/products", json=[{"id": product.id, "amount": 7}]
+    )
+    assert response.status_code == 422
+    response = await test_client.put(f"/products/{product.id}", json={"amount": 8})
+    assert response.status_code == 200
+    assert response.json()["product"]["amount"] == 8